@@ -0,0 +1,113 @@
+"""
+Run the benchmarks offline, against fake discord objects.
+
+Results are printed as a table and saved as JSON, so they can be compared with the results of another run::
+
+    python -m benchmarks --compare .cache/benchmarks/<previous run>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+# The configuration requires a token, which the benchmarks never use.
+os.environ.setdefault("BOT_TOKEN", "benchmarks")
+
+from benchmarks import bench_helpers, bench_nominations  # noqa: E402
+from benchmarks._core import measure  # noqa: E402
+
+SUITES = {
+    "helpers": bench_helpers,
+    "nominations": bench_nominations,
+}
+DEFAULT_SIZES = [100, 1_000, 10_000, 50_000]
+DEFAULT_CHUNK_SIZES = [None, 50, 200, 1_000]
+DEFAULT_BUDGETS = [0.5, 2.0, 8.0]
+RESULTS_DIRECTORY = Path(".cache", "benchmarks")
+
+
+def chunk_size(value: str) -> Optional[int]:
+    """Parse a chunk size, where `none` means not chunking."""
+    return None if value.lower() == "none" else int(value)
+
+
+def git_revision() -> Optional[str]:
+    """Return the hash of the checked out commit, if this is a git repository."""
+    try:
+        result = subprocess.run(("git", "rev-parse", "HEAD"), capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def print_results(results: list[dict[str, Any]], previous: dict[str, dict[str, Any]]) -> None:
+    """Print the results as a table, with the change from the previous results if there are any."""
+    print(f"{'benchmark':<80} {'median':>11} {'per item':>11} {'max block':>11} {'change':>8}")
+    for result in results:
+        change = ""
+        if before := previous.get(result["id"]):
+            change = f"{(result['median_ms'] / before['median_ms'] - 1) * 100:+.1f}%"
+        per_item = f"{result['per_item_us']:.3f}us" if result["per_item_us"] is not None else ""
+        print(
+            f"{result['id']:<80} {result['median_ms']:>9.3f}ms {per_item:>11} "
+            f"{result['max_block_ms']:>9.3f}ms {change:>8}"
+        )
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Run the selected suites and return their results."""
+    results = []
+    for name in args.suites:
+        for case in SUITES[name].cases(args.sizes, args.chunk_sizes, [budget / 1000 for budget in args.budgets]):
+            results.append(await measure(case, args.repeat))
+    return results
+
+
+def main() -> None:
+    """Parse the arguments, run the benchmarks, and save the results."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("suites", nargs="*", default=list(SUITES), help=f"suites to run: {', '.join(SUITES)}")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="message cache sizes")
+    parser.add_argument(
+        "--chunk-sizes", nargs="+", type=chunk_size, default=DEFAULT_CHUNK_SIZES, help="chunk sizes, or none"
+    )
+    parser.add_argument(
+        "--budgets", nargs="+", type=float, default=DEFAULT_BUDGETS, help="time budgets of budgeted finds, in ms"
+    )
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs of each benchmark")
+    parser.add_argument("--output", type=Path, help="where to save the JSON results")
+    parser.add_argument("--compare", type=Path, help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+    if unknown := set(args.suites) - SUITES.keys():
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    previous = {}
+    if args.compare:
+        previous = {result["id"]: result for result in json.loads(args.compare.read_text())["results"]}
+
+    results = asyncio.run(run(args))
+    print_results(results, previous)
+
+    revision = git_revision()
+    output = args.output or RESULTS_DIRECTORY / f"{time.strftime('%Y%m%d-%H%M%S')}-{(revision or 'unknown')[:8]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "meta": {
+            "timestamp": time.time(),
+            "revision": revision,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }, indent=2))
+    print(f"\nSaved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
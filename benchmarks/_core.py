@@ -0,0 +1,68 @@
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+
+@dataclass
+class Case:
+    """A benchmark with one set of parameters, processing `items` elements every run."""
+
+    benchmark: str
+    params: dict[str, Any]
+    items: int
+    run: Callable[[], Awaitable[Any]]
+
+    @property
+    def id(self) -> str:
+        """A name identifying the benchmark and its parameters, to match results across runs."""
+        params = ",".join(f"{key}={value}" for key, value in self.params.items())
+        return f"{self.benchmark}[{params}]"
+
+
+async def _ticker(gaps: list[float]) -> None:
+    """Record how long the event loop took to run this task again, every time it yields."""
+    last = time.perf_counter()
+    while True:
+        await asyncio.sleep(0)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def measure(case: Case, repeat: int) -> dict[str, Any]:
+    """
+    Run `case` `repeat` times and return its timings, in milliseconds.
+
+    The longest time the case blocked the event loop for is measured in an extra run, alongside a task
+    which records the time between its turns, so the task doesn't skew the other timings.
+    """
+    await case.run()  # Warm up caches, such as compiled regexes.
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await case.run()
+        times.append((time.perf_counter() - start) * 1000)
+
+    gaps = []
+    ticker = asyncio.create_task(_ticker(gaps))
+    await asyncio.sleep(0)  # Let the ticker start.
+    await case.run()
+    await asyncio.sleep(0)  # Let the ticker record the gap spanning the end of the run.
+    ticker.cancel()
+
+    median = statistics.median(times)
+    return {
+        "id": case.id,
+        "benchmark": case.benchmark,
+        "params": case.params,
+        "items": case.items,
+        "repeat": repeat,
+        "min_ms": round(min(times), 4),
+        "median_ms": round(median, 4),
+        "mean_ms": round(statistics.fmean(times), 4),
+        "per_item_us": round(median * 1000 / case.items, 4) if case.items else None,
+        "max_block_ms": round(max(gaps) * 1000, 4),
+    }
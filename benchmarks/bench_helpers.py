@@ -0,0 +1,66 @@
+from collections import deque
+from typing import Iterator, Optional, Union
+
+from benchmarks._core import Case
+from benchmarks.fakes import FakeBot, FakeMessage, FakeTextChannel, fill_cache
+from bot import constants
+from bot.message_cache import ChannelMessageCache
+from bot.utils.helpers import ThreadResolver, chunked_find
+
+
+async def append_all(cache: Union[deque, ChannelMessageCache], messages: list[FakeMessage]) -> None:
+    """Append every message to an empty `cache`, as discord.py does when they are sent."""
+    cache.clear()
+    for message in messages:
+        cache.append(message)
+
+
+def cases(sizes: list[int], chunk_sizes: list[Optional[int]], budgets: list[float]) -> Iterator[Case]:
+    """Benchmark chunked_find, and caching messages and finding threads through them, for every size and chunk size."""
+    channel = FakeTextChannel(constants.Channels.nomination_voting)
+
+    for size in sizes:
+        bot = FakeBot()
+        starters = fill_cache(bot, size, channel=channel)
+        messages = bot.cached_messages
+
+        for chunk_size in chunk_sizes:
+            # Nothing matches, so every message is checked, as when the thread isn't cached.
+            yield Case(
+                "chunked_find",
+                {"cache_size": size, "chunk_size": chunk_size, "case": "miss"},
+                size,
+                lambda messages=messages, chunk_size=chunk_size: chunked_find(
+                    lambda message: message.id < 0, messages, chunk_size=chunk_size
+                )
+            )
+
+        for budget in budgets:
+            yield Case(
+                "chunked_find",
+                {"cache_size": size, "budget_ms": budget * 1000, "case": "miss"},
+                size,
+                lambda messages=messages, budget=budget: chunked_find(
+                    lambda message: message.id < 0, messages, budget=budget
+                )
+            )
+
+        # discord.py's default cache of every message, against only keeping the messages of the voting channel.
+        for name, cache in (("deque", deque(maxlen=size)), ("channels", ChannelMessageCache(size, {channel.id}))):
+            yield Case(
+                "message_cache.append",
+                {"cache_size": size, "cache": name},
+                size,
+                lambda cache=cache, messages=messages: append_all(cache, messages)
+            )
+
+        resolver = ThreadResolver(bot)
+        # Thread starters are indexed, so finding the newest or oldest vote's thread takes as long as a miss.
+        newest = starters[-1] if starters else 0
+        for case, message_id in (("newest", newest), ("miss", -1)):
+            yield Case(
+                "resolver.message_cache",
+                {"cache_size": size, "case": case},
+                size,
+                lambda resolver=resolver, message_id=message_id: resolver._from_message_cache(message_id, channel)
+            )
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+from benchmarks._core import Case
+from benchmarks.fakes import FakeMessage, FakeTextChannel, build_messages
+from bot import constants
+from bot.exts.recruitment._votes import NOMINATION_MESSAGE_REGEX, VoteAssembler
+from bot.exts.recruitment.nominations import Nominations
+
+
+async def match_all(messages: list[FakeMessage]) -> None:
+    """Match the vote regex against every message."""
+    for message in messages:
+        NOMINATION_MESSAGE_REGEX.match(message.content)
+
+
+async def dispatch_all(messages: list[FakeMessage]) -> None:
+    """Run the Nominations on_message listener on every message, with thread creation stubbed out."""
+    async def queue_create(*args) -> None:
+        pass
+
+    # Only the attributes on_message uses, so the cog doesn't need a bot, database, or outbox.
+    cog = SimpleNamespace(
+        votes=VoteAssembler(constants.VOTE_ASSEMBLY_TIMEOUT),
+        queue_create=queue_create,
+        reconciled=False
+    )
+    for message in messages:
+        await Nominations.on_message(cog, message)
+
+
+def cases(sizes: list[int], chunk_sizes: list[Optional[int]], budgets: list[float]) -> Iterator[Case]:
+    """Benchmark matching votes and filtering messages in Nominations, for every amount of messages."""
+    voting_channel = FakeTextChannel(constants.Channels.nomination_voting)
+    other_channels = [FakeTextChannel(voting_channel.id + i) for i in range(1, 10)]
+
+    for size in sizes:
+        # As in the voting channel, where a fifth of the messages start a vote.
+        votes = build_messages(size, voting_channel=voting_channel, other_channels=other_channels, voting_share=1)
+        yield Case(
+            "nominations.regex",
+            {"messages": size},
+            size,
+            lambda votes=votes: match_all(votes)
+        )
+
+        # As seen by the listener, where a tenth of the messages are posted in the voting channel.
+        messages = build_messages(size, voting_channel=voting_channel, other_channels=other_channels)
+        yield Case(
+            "nominations.on_message",
+            {"messages": size},
+            size,
+            lambda messages=messages: dispatch_all(messages)
+        )
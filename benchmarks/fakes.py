@@ -0,0 +1,205 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional, Union
+
+import discord
+
+from bot.exts.recruitment._votes import NOMINATION_ENDING_TEXT
+from bot.message_cache import ChannelMessageCache
+
+# Snowflake of the first fake message, and how far apart fake messages are posted.
+FIRST_MESSAGE_ID = discord.utils.time_snowflake(datetime(2021, 8, 1, tzinfo=timezone.utc))
+MESSAGE_INTERVAL = timedelta(seconds=5)
+
+VOTE_START = "<@{user_id}> ({name}#{discriminator:04}) for Helper!\n\n**Nominated by:** <@{nominator_id}>\n\n{reason}"
+VOTE_END = f"**Nominated by:** <@1234>\n\n*Reason: very helpful. {NOMINATION_ENDING_TEXT}"
+CHAT_MESSAGES = (
+    "Has anyone seen the latest PEP?",
+    "I think the reason is that `list.sort` is stable, so the second sort keeps the first order.",
+    "lgtm :+1:",
+    "You can use `functools.cache` for that, it's new in 3.9.\n\nSomething like:\n```py\n@cache\ndef f(): ...\n```",
+)
+
+
+class NullStats:
+    """A stand-in for the statsd client that drops every metric."""
+
+    def timing(self, *args, **kwargs) -> None:
+        """Drop a timing."""
+
+    def incr(self, *args, **kwargs) -> None:
+        """Drop a counter."""
+
+    def gauge(self, *args, **kwargs) -> None:
+        """Drop a gauge."""
+
+
+class FakeUser:
+    """The parts of a discord.User read by the code under benchmark."""
+
+    __slots__ = ("id",)
+
+    def __init__(self, id_: int):
+        self.id = id_
+
+
+class FakeThread(discord.Thread):
+    """A discord.Thread that passes isinstance checks, without needing a connection state."""
+
+    def __init__(self, id_: int, parent_id: int, name: str = "Nomination - Someone", archived: bool = False):
+        self.id = id_
+        self.parent_id = parent_id
+        self.name = name
+        self.archived = archived
+
+    def __repr__(self) -> str:
+        return f"<FakeThread id={self.id}>"
+
+
+class FakeTextChannel:
+    """The parts of a discord.TextChannel read by the code under benchmark."""
+
+    def __init__(self, id_: int):
+        self.id = id_
+        self._threads: dict[int, FakeThread] = {}
+
+    @property
+    def threads(self) -> list[FakeThread]:
+        """The cached threads of the channel."""
+        return list(self._threads.values())
+
+    def get_thread(self, thread_id: int) -> Optional[FakeThread]:
+        """Return the cached thread with `thread_id`, if there is one."""
+        return self._threads.get(thread_id)
+
+    def add_thread(self, thread: FakeThread) -> None:
+        """Cache `thread`."""
+        self._threads[thread.id] = thread
+
+
+class FakeMessage:
+    """The parts of a discord.Message read by the code under benchmark."""
+
+    __slots__ = ("id", "channel", "author", "content", "reference", "type", "created_at")
+
+    def __init__(
+        self,
+        id_: int,
+        channel: Union[FakeTextChannel, FakeThread],
+        author: FakeUser,
+        content: str,
+        reference: Optional[discord.MessageReference] = None,
+        type_: discord.MessageType = discord.MessageType.default
+    ):
+        self.id = id_
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.reference = reference
+        self.type = type_
+        self.created_at = discord.utils.snowflake_time(id_)
+
+
+class FakeBot:
+    """The parts of the bot used by the code under benchmark, with message caches filled by `fill_cache`."""
+
+    def __init__(self):
+        self.stats = NullStats()
+        # Every message, as discord.py caches them by default, and only those the bot's own message cache keeps.
+        self.cached_messages: list[FakeMessage] = []
+        self.message_cache: Optional[ChannelMessageCache] = None
+
+
+def message_ids(start: int = FIRST_MESSAGE_ID) -> Iterator[int]:
+    """Yield increasing message snowflakes, posted `MESSAGE_INTERVAL` apart."""
+    timestamp = discord.utils.snowflake_time(start)
+    while True:
+        yield discord.utils.time_snowflake(timestamp)
+        timestamp += MESSAGE_INTERVAL
+
+
+def vote_start(rng: random.Random) -> str:
+    """Return the first message of a vote for a random member."""
+    return VOTE_START.format(
+        user_id=rng.randrange(10 ** 17, 10 ** 18),
+        name=f"member{rng.randrange(10_000)}",
+        discriminator=rng.randrange(10_000),
+        nominator_id=rng.randrange(10 ** 17, 10 ** 18),
+        reason="Always around to help in the help channels. " * rng.randrange(1, 20)
+    )
+
+
+def build_messages(
+    count: int,
+    *,
+    voting_channel: FakeTextChannel,
+    other_channels: list[FakeTextChannel],
+    voting_share: float = 0.1,
+    vote_share: float = 0.2,
+    seed: int = 0
+) -> list[FakeMessage]:
+    """
+    Return `count` messages, oldest first, of which `voting_share` are posted in `voting_channel`.
+
+    In the voting channel, `vote_share` of the messages start a vote, which is ended by the next message from
+    the same author. The other messages are chat messages in a random channel of `other_channels`.
+    """
+    rng = random.Random(seed)
+    ids = message_ids()
+    authors = [FakeUser(rng.randrange(10 ** 17, 10 ** 18)) for _ in range(20)]
+    messages = []
+    open_votes = set()
+
+    for _ in range(count):
+        author = rng.choice(authors)
+        if rng.random() >= voting_share:
+            content = rng.choice(CHAT_MESSAGES)
+            messages.append(FakeMessage(next(ids), rng.choice(other_channels), author, content))
+        elif author.id in open_votes:
+            open_votes.discard(author.id)
+            messages.append(FakeMessage(next(ids), voting_channel, author, VOTE_END))
+        elif rng.random() < vote_share:
+            open_votes.add(author.id)
+            messages.append(FakeMessage(next(ids), voting_channel, author, vote_start(rng)))
+        else:
+            messages.append(FakeMessage(next(ids), voting_channel, author, rng.choice(CHAT_MESSAGES)))
+    return messages
+
+
+def fill_cache(
+    bot: FakeBot,
+    size: int,
+    *,
+    channel: FakeTextChannel,
+    starter_share: float = 0.01,
+    seed: int = 0
+) -> list[int]:
+    """
+    Fill the message caches of `bot` with `size` messages, oldest first, and return the ids of the thread starters.
+
+    `starter_share` of them are the thread_starter_messages of threads in `channel`, which reference the vote
+    message the thread was started from, and the rest are chat messages in other channels. Only the thread
+    starters are kept by `bot.message_cache`, which caches the messages of `channel`.
+    """
+    rng = random.Random(seed)
+    ids = message_ids()
+    other_channel = FakeTextChannel(channel.id + 1)
+    author = FakeUser(1)
+    starters = []
+    bot.cached_messages = []
+
+    for _ in range(size):
+        message_id = next(ids)
+        if rng.random() < starter_share:
+            thread = FakeThread(message_id, channel.id)
+            reference = discord.MessageReference(message_id=message_id, channel_id=channel.id)
+            bot.cached_messages.append(
+                FakeMessage(next(ids), thread, author, "", reference, discord.MessageType.thread_starter_message)
+            )
+            starters.append(message_id)
+        else:
+            bot.cached_messages.append(FakeMessage(message_id, other_channel, author, rng.choice(CHAT_MESSAGES)))
+
+    bot.message_cache = ChannelMessageCache(size, {channel.id})
+    bot.message_cache.extend(bot.cached_messages)
+    return starters
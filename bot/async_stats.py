@@ -1,39 +1,349 @@
 import asyncio
+import ipaddress
+import random
 import socket
+from array import array
+from collections import deque
+from datetime import timedelta
+from typing import Optional, Union
 
+import aiodns
 from statsd.client.base import StatsClientBase
 
+from bot import logger
+
+# Largest payload that fits in a single packet on a 1500 byte MTU network, leaving room for the headers.
+MAX_PACKET_SIZE = 1432
+# Packets kept until the transport is created, the oldest are dropped when there are more.
+MAX_PENDING_PACKETS = 1000
+
+# How long to keep a resolved address when its TTL is unknown, and the bounds applied to known TTLs, in seconds.
+DEFAULT_DNS_TTL = 60
+MIN_DNS_TTL = 5
+MAX_DNS_TTL = 3600
+# Longest delay between attempts to resolve the host after it failed, in seconds.
+MAX_RESOLVE_RETRY = 60
+
+Number = Union[int, float]
+
+
+def _format_number(value: Number) -> str:
+    """Format `value` for statsd, dropping the fractional part of whole floats."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
 
 class AsyncStatsClient(StatsClientBase):
-    """An async transport method for statsd communication."""
+    """
+    An async transport method for statsd communication.
+
+    In buffered mode, metrics are kept in memory and sent as newline separated multi-metric packets,
+    either when the next metric wouldn't fit in `max_packet_size` or `flush_interval` seconds after
+    the first buffered metric, whichever happens first.
+
+    If `aggregate_interval` is set, metrics are also aggregated over windows of that many seconds
+    and a single line is sent per key at the end of each window: counters are summed, gauges keep
+    their last value (or the sum of their changes), and timings and set values are sent together as a
+    multi-value line (`key:1|ms:2|ms`). Timings are sampled at `timer_sample_rate` unless a rate is given.
+
+    The host is resolved asynchronously when the socket is created, and re-resolved in the background
+    whenever the DNS record's TTL expires. If the address changed, the transport is swapped for one
+    connected to the new address; buffered metrics are kept and sent through the new transport.
+    Metrics sent before there is a transport are kept, up to `MAX_PENDING_PACKETS` packets, and sent
+    as soon as it's created.
+    """
 
     def __init__(
         self,
         loop: asyncio.AbstractEventLoop,
         host: str = 'localhost',
         port: int = 8125,
-        prefix: str = None
+        prefix: str = None,
+        *,
+        buffered: bool = False,
+        flush_interval: float = 1.0,
+        max_packet_size: int = MAX_PACKET_SIZE,
+        aggregate_interval: Optional[float] = None,
+        timer_sample_rate: float = 1
     ):
-        """Create a new client."""
-        family, _, _, _, addr = socket.getaddrinfo(
-            host, port, socket.AF_INET, socket.SOCK_DGRAM)[0]
-        self._addr = addr
+        """Create a new client. The host isn't resolved until `create_socket` is called."""
+        self._host = host
+        self._port = port
+        self._addr: Optional[tuple[str, int]] = None
         self._prefix = prefix
         self._loop = loop
         self._transport = None
+        self._resolver: Optional[aiodns.DNSResolver] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._pending: deque[bytes] = deque(maxlen=MAX_PENDING_PACKETS)
+        self._dropped = 0
 
-    async def create_socket(self) -> None:
-        """Use the loop.create_datagram_endpoint method to create a socket."""
-        self._transport, _ = await self._loop.create_datagram_endpoint(
+        self._buffered = buffered
+        self._flush_interval = flush_interval
+        self._max_packet_size = max_packet_size
+        self._buffer: list[str] = []
+        self._buffer_size = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self._aggregate_interval = aggregate_interval
+        self._timer_sample_rate = timer_sample_rate
+        self._counters: dict[str, Number] = {}
+        # Maps keys to their value and whether that value is a change rather than an absolute value.
+        self._gauges: dict[str, tuple[Number, bool]] = {}
+        self._timers: dict[str, tuple[array, float]] = {}
+        self._sets: dict[str, set] = {}
+        self._aggregate_handle: Optional[asyncio.TimerHandle] = None
+
+    async def _resolve(self) -> tuple[tuple[str, int], Optional[float]]:
+        """Resolve the host without blocking, returning its address and how long it may be cached for."""
+        try:
+            ipaddress.ip_address(self._host)
+        except ValueError:
+            pass
+        else:
+            return (self._host, self._port), None  # IP addresses never need to be resolved again.
+
+        if self._resolver is None:
+            self._resolver = aiodns.DNSResolver(loop=self._loop)
+
+        try:
+            result, *_ = await self._resolver.query(self._host, "A")
+        except aiodns.error.DNSError:
+            # Names such as `localhost` usually only exist in the hosts file, which only getaddrinfo reads.
+            # The loop runs it in an executor, so it won't block either.
+            *_, addr = (await self._loop.getaddrinfo(self._host, self._port, family=socket.AF_INET))[0]
+            return addr, DEFAULT_DNS_TTL
+
+        return (result.host, self._port), min(max(result.ttl, MIN_DNS_TTL), MAX_DNS_TTL)
+
+    async def _connect(self, addr: tuple[str, int]) -> None:
+        """Create a socket connected to `addr`, closing the socket it replaces."""
+        transport, _ = await self._loop.create_datagram_endpoint(
             asyncio.DatagramProtocol,
             family=socket.AF_INET,
-            remote_addr=self._addr
+            remote_addr=addr
         )
+        old_transport, self._transport, self._addr = self._transport, transport, addr
+        if old_transport:
+            old_transport.close()
+
+        if self._dropped:
+            logger.warning(f"Dropped {self._dropped} statsd packets sent before the transport was created.")
+            self._dropped = 0
+        while self._pending:
+            transport.sendto(self._pending.popleft())
+
+    async def create_socket(self) -> None:
+        """
+        Resolve the host and use the loop.create_datagram_endpoint method to create a socket.
+
+        If the host can't be resolved, resolving is retried in the background instead.
+        """
+        if self._refresh_task:
+            self._refresh_task.cancel()
+
+        try:
+            addr, ttl = await self._resolve()
+        except (aiodns.error.DNSError, OSError) as e:
+            logger.warning(f"Failed to resolve statsd host {self._host}, retrying in the background: {e}")
+            self._refresh_task = self._loop.create_task(self._refresh_address(None))
+            return
+
+        await self._connect(addr)
+        if ttl is not None:
+            self._refresh_task = self._loop.create_task(self._refresh_address(ttl))
+
+    async def _refresh_address(self, ttl: Optional[float]) -> None:
+        """
+        Re-resolve the host every time its TTL expires and reconnect if its address changed.
+
+        `ttl` being None means the last attempt failed, in which case it's retried with an increasing delay.
+        """
+        retry_after = 2
+        while True:
+            await asyncio.sleep(ttl if ttl is not None else retry_after)
+
+            try:
+                addr, ttl = await self._resolve()
+            except (aiodns.error.DNSError, OSError) as e:
+                logger.warning(f"Failed to resolve statsd host {self._host}, retrying in {retry_after}s: {e}")
+                ttl, retry_after = None, min(retry_after * 2, MAX_RESOLVE_RETRY)
+                continue
+            retry_after = 2
+
+            if addr != self._addr:
+                logger.info(f"Statsd host {self._host} now resolves to {addr[0]}, reconnecting.")
+                try:
+                    await self._connect(addr)
+                except OSError as e:
+                    logger.warning(f"Failed to connect to statsd at {addr[0]}: {e}")
+                    ttl = None
+
+    @staticmethod
+    def _sampled_out(rate: float) -> bool:
+        """Randomly decide whether to drop a metric sampled at `rate`."""
+        return rate < 1 and random.random() > rate
+
+    def _start_window(self) -> None:
+        """Schedule the current aggregation window to be flushed if it isn't already."""
+        if self._aggregate_handle is None:
+            self._aggregate_handle = self._loop.call_later(self._aggregate_interval, self.flush_aggregates)
+
+    def timing(self, stat: str, delta: Union[Number, timedelta], rate: Optional[float] = None) -> None:
+        """Send new timing information, or record it in the current window when aggregating."""
+        if rate is None:
+            rate = self._timer_sample_rate
+        if not self._aggregate_interval:
+            super().timing(stat, delta, rate)
+            return
+
+        if self._sampled_out(rate):
+            return
+        if isinstance(delta, timedelta):
+            delta = delta.total_seconds() * 1000
+
+        samples, _ = self._timers.get(stat, (array("d"), rate))
+        samples.append(delta)
+        self._timers[stat] = (samples, rate)
+        self._start_window()
+
+    def incr(self, stat: str, count: Number = 1, rate: float = 1) -> None:
+        """Increment a stat by `count`, summing it with the current window's count when aggregating."""
+        if not self._aggregate_interval:
+            super().incr(stat, count, rate)
+            return
+
+        if self._sampled_out(rate):
+            return
+        if rate < 1:
+            # Scale sampled counts up here, as the rate is no longer sent along with them.
+            count /= rate
+        self._counters[stat] = self._counters.get(stat, 0) + count
+        self._start_window()
+
+    def gauge(self, stat: str, value: Number, rate: float = 1, delta: bool = False) -> None:
+        """Set a gauge value, replacing the current window's value when aggregating."""
+        if not self._aggregate_interval:
+            super().gauge(stat, value, rate, delta)
+            return
+
+        if self._sampled_out(rate):
+            return
+        if delta and stat in self._gauges:
+            previous, previous_is_delta = self._gauges[stat]
+            self._gauges[stat] = (previous + value, previous_is_delta)
+        else:
+            self._gauges[stat] = (value, delta)
+        self._start_window()
+
+    def set(self, stat: str, value: object, rate: float = 1) -> None:
+        """Set a set value, collecting the window's unique values when aggregating."""
+        if not self._aggregate_interval:
+            super().set(stat, value, rate)
+            return
+
+        if self._sampled_out(rate):
+            return
+        self._sets.setdefault(stat, set()).add(value)
+        self._start_window()
+
+    def _send_multi_value(self, stat: str, values: list[str]) -> None:
+        """Send `values` for `stat` as multi-value lines, splitting them up when they don't fit in one packet."""
+        line = stat
+        for value in values:
+            if len(line) + len(value) + 1 > self._max_packet_size and line != stat:
+                self._send(line)
+                line = stat
+            line = f"{line}:{value}"
+        self._send(line)
+
+    def flush_aggregates(self) -> None:
+        """Send a single line per key aggregated in the current window and start a new window."""
+        if self._aggregate_handle:
+            self._aggregate_handle.cancel()
+            self._aggregate_handle = None
+
+        prefix = f"{self._prefix}." if self._prefix else ""
+
+        for stat, count in self._counters.items():
+            self._send(f"{prefix}{stat}:{_format_number(count)}|c")
+
+        for stat, (value, is_delta) in self._gauges.items():
+            if is_delta:
+                self._send(f"{prefix}{stat}:{'+' if value >= 0 else ''}{_format_number(value)}|g")
+            elif value < 0:
+                # Negative values would be read as a change, so the gauge is reset to 0 first.
+                self._send_multi_value(f"{prefix}{stat}", ["0|g", f"{_format_number(value)}|g"])
+            else:
+                self._send(f"{prefix}{stat}:{_format_number(value)}|g")
+
+        for stat, (samples, rate) in self._timers.items():
+            suffix = f"|ms|@{rate}" if rate < 1 else "|ms"
+            values = [f"{_format_number(round(sample, 3))}{suffix}" for sample in samples]
+            self._send_multi_value(f"{prefix}{stat}", values)
+
+        for stat, values in self._sets.items():
+            self._send_multi_value(f"{prefix}{stat}", [f"{value}|s" for value in values])
+
+        self._counters.clear()
+        self._gauges.clear()
+        self._timers.clear()
+        self._sets.clear()
 
     def _send(self, data: str) -> None:
-        """Start an async task to send data to statsd."""
-        self._loop.create_task(self._async_send(data))
+        """Buffer `data` in buffered mode, otherwise start an async task to send it to statsd."""
+        if not self._buffered:
+            self._loop.create_task(self._async_send(data))
+            return
+
+        # Account for the newline separating it from the previous metric.
+        size = len(data) + 1 if self._buffer else len(data)
+        if self._buffer and self._buffer_size + size > self._max_packet_size:
+            self.flush()
+            size = len(data)
+
+        self._buffer.append(data)
+        self._buffer_size += size
+
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self._flush_interval, self.flush)
 
     async def _async_send(self, data: str) -> None:
         """Send data to the statsd server using the async transport."""
-        self._transport.sendto(data.encode('ascii'), self._addr)
+        self._send_packet(data)
+
+    def _send_packet(self, data: str) -> None:
+        """Send `data` as a single packet, or keep it until the transport is created if there isn't one yet."""
+        packet = data.encode('ascii')
+        if self._transport:
+            self._transport.sendto(packet)
+            return
+
+        if len(self._pending) == self._pending.maxlen:
+            self._dropped += 1
+        self._pending.append(packet)
+
+    def flush(self) -> None:
+        """Send all buffered metrics to the statsd server in a single packet."""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._buffer:
+            return
+
+        data = "\n".join(self._buffer)
+        self._buffer.clear()
+        self._buffer_size = 0
+        self._send_packet(data)
+
+    def close(self) -> None:
+        """Send any aggregated or buffered metrics and close the transport."""
+        if self._refresh_task:
+            self._refresh_task.cancel()
+
+        self.flush_aggregates()
+        self.flush()
+        if self._transport:
+            self._transport.close()
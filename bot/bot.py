@@ -1,23 +1,39 @@
 import asyncio
-import socket
+import importlib.machinery
+import importlib.util
+import os
+import time
+from types import CodeType
+from typing import Any, Awaitable, Callable, Coroutine, Iterable, Optional
 
 import discord
 from discord import Embed
 from discord.ext import commands
 
-from bot import async_stats, constants, logger
+from bot import async_stats, constants, database, logger
+from bot.dispatch_profiler import DispatchProfiler
+from bot.lag_monitor import LagMonitor
+from bot.message_cache import ChannelMessageCache, ThreadConnectionState, configured_channels
+from bot.outbox import Outbox
+from bot.scheduler import Scheduler
+from bot.utils.ratelimit import BucketScheduler, RateLimit
 
 LOCALHOST = "127.0.0.1"
 
+# The entry points of an extension waiting to be loaded, and the commands and (event, listener) pairs standing in.
+LazyExtension = tuple[dict[str, list], list[commands.Command], list[tuple[str, Callable]]]
+
 
 class ThreadBot(commands.Bot):
     """Base bot instance."""
 
     name = constants.Bot.name
+    dispatch_profiler: Optional[DispatchProfiler] = None
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._guild_available = asyncio.Event()
+        self.db = database.Database(self.loop, constants.Database.path)
 
         statsd_url = constants.Stats.statsd_host
 
@@ -27,35 +43,96 @@ class ThreadBot(commands.Bot):
             # will effectively disable stats.
             statsd_url = LOCALHOST
 
-        self._statsd_timerhandle: asyncio.TimerHandle = None
-        self.stats = async_stats.AsyncStatsClient(self.loop, LOCALHOST)
-        self._connect_statsd(statsd_url)
+        self.stats = async_stats.AsyncStatsClient(
+            self.loop,
+            statsd_url,
+            8125,
+            prefix="bot",
+            buffered=constants.Stats.buffered,
+            flush_interval=constants.Stats.flush_interval,
+            aggregate_interval=constants.Stats.aggregate_interval,
+            timer_sample_rate=constants.Stats.timer_sample_rate
+        )
 
-        self.loop.create_task(self.check_channels())
-        self.loop.create_task(self.send_log(self.name, "Connected!"))
+        if constants.Stats.profile_dispatch:
+            self.dispatch_profiler = DispatchProfiler(self.stats)
 
-    def _connect_statsd(self, statsd_url: str, retry_after: int = 2, attempt: int = 1) -> None:
-        """Callback used to retry a connection to statsd if it should fail."""
-        if attempt >= 8:
-            logger.error("Reached 8 attempts trying to reconnect AsyncStatsClient. Aborting")
-            return
+        self.lag_monitor = LagMonitor(
+            self,
+            interval=constants.LagMonitor.interval,
+            threshold=constants.LagMonitor.threshold,
+            report_interval=constants.LagMonitor.report_interval,
+            alert_cooldown=constants.LagMonitor.alert_cooldown
+        )
 
-        try:
-            self.stats = async_stats.AsyncStatsClient(self.loop, statsd_url, 8125, prefix="bot")
-        except socket.gaierror:
-            logger.warning(f"Statsd client failed to connect (Attempt(s): {attempt})")
-            # Use a fallback strategy for retrying, up to 8 times.
-            self._statsd_timerhandle = self.loop.call_later(
-                retry_after,
-                self._connect_statsd,
-                statsd_url,
-                retry_after * 2,
-                attempt + 1
-            )
+        # Paces thread operations so bursts of votes don't run into Discord's rate limits.
+        self.thread_ops = BucketScheduler(
+            self.loop,
+            self.stats,
+            "thread_ops",
+            limits={route: RateLimit(*limit) for route, limit in constants.THREAD_OPERATION_LIMITS.items()},
+            default_limit=RateLimit(*constants.THREAD_OPERATION_DEFAULT_LIMIT)
+        )
+
+        # Thread operations that must eventually happen, even if they fail or the bot restarts.
+        self.outbox = Outbox(self.loop, self.db)
+        # Actions to run at a later time, such as archiving threads, kept across restarts.
+        self.scheduler = Scheduler(self.loop, self.db)
+
+        # Maps extension names to how long importing, running `setup`, and running `async_setup` took, in seconds.
+        self.extension_load_times: dict[str, dict[str, float]] = {}
+        self._async_setup_tasks: dict[str, asyncio.Task] = {}
+        # Maps extension names to the path, modification time, and code object compiled ahead of loading them.
+        self._precompiled: dict[str, tuple[str, int, CodeType]] = {}
+
+        # Maps the names of extensions waiting to be loaded on first use to their entry points and the stubs
+        # standing in for their commands and listeners.
+        self._lazy_extensions: dict[str, LazyExtension] = {}
 
         # All tasks that need to block closing until finished
         self.closing_tasks: list[asyncio.Task] = []
 
+        constants.subscribe(self.configure_message_cache)
+
+        self.add_listener(self._stop_command_timer, "on_command_completion")
+        self.add_listener(self._stop_command_timer, "on_command_error")
+
+        self.loop.create_task(self.check_channels())
+        self.loop.create_task(self.start_workers())
+        self.loop.create_task(self.send_log(self.name, "Connected!"))
+
+    async def _stop_command_timer(self, ctx: commands.Context, error: commands.CommandError = None) -> None:
+        """Send how long a command took and whether it succeeded to statsd."""
+        started_at = getattr(ctx, "command_started_at", None)
+        if ctx.command is None or started_at is None:
+            return  # The command doesn't exist, so it was never invoked.
+
+        stat = f"commands.{ctx.command.qualified_name.replace(' ', '.')}"
+        self.stats.timing(stat, (time.perf_counter() - started_at) * 1000)
+        self.stats.incr(f"{stat}.{'failure' if error else 'success'}")
+
+    def _get_state(self, **options) -> ThreadConnectionState:
+        """Create the connection state, which only caches messages from the channels in the configuration."""
+        # Passes the same arguments as `discord.Client._get_state`.
+        return ThreadConnectionState(
+            dispatch=self.dispatch,
+            handlers=self._handlers,
+            hooks=self._hooks,
+            http=self.http,
+            loop=self.loop,
+            cached_channels=configured_channels(),
+            **options
+        )
+
+    @property
+    def message_cache(self) -> Optional[ChannelMessageCache]:
+        """The cache of messages posted in the channels in the configuration, or None if messages aren't cached."""
+        return self._connection._messages
+
+    def configure_message_cache(self) -> None:
+        """Apply the size and channels of the message cache from the configuration."""
+        self._connection.configure_message_cache(constants.MessageCache.size, configured_channels())
+
     @classmethod
     def create(cls) -> "ThreadBot":
         """Create and return an instance of a ThreadBot."""
@@ -72,22 +149,232 @@ class ThreadBot(commands.Bot):
             case_insensitive=True,
             allowed_mentions=discord.AllowedMentions(everyone=False, roles=allowed_roles),
             intents=intents,
+            max_messages=constants.MessageCache.size,
         )
 
     def load_extensions(self) -> None:
-        """Load all enabled extensions."""
+        """Load all enabled extensions, and report how long loading them took once they are all set up."""
         # Must be done here to avoid a circular import.
-        from bot.utils.extensions import EXTENSIONS
+        from bot.utils.extensions import ENTRY_POINTS, EXTENSIONS
 
         extensions = set(EXTENSIONS)  # Create a mutable copy.
         for extension in extensions:
-            self.load_extension(extension)
+            if extension in constants.Bot.lazy_extensions:
+                self.add_lazy_extension(extension, ENTRY_POINTS[extension])
+            else:
+                self.load_extension(extension)
+
+        self.loop.create_task(self._report_extension_load_times())
+
+    def add_lazy_extension(self, name: str, entry_points: dict[str, list]) -> None:
+        """
+        Register stubs for the commands and listeners of the extension `name`, which load it when first used.
+
+        `entry_points` are the extension's top-level commands and listeners, as found in the extension manifest.
+        """
+        stub_commands = []
+        for command in entry_points["commands"]:
+            stub = commands.Command(
+                self._lazy_command(name),
+                name=command["name"],
+                aliases=command["aliases"],
+                hidden=True
+            )
+            self.add_command(stub)
+            stub_commands.append(stub)
+
+        stub_listeners = []
+        for event in dict.fromkeys(entry_points["listeners"]):  # Remove duplicates, but keep the order.
+            listener = self._lazy_listener(name, event)
+            self.add_listener(listener, event)
+            stub_listeners.append((event, listener))
+
+        self._lazy_extensions[name] = (entry_points, stub_commands, stub_listeners)
+        logger.info(f"Extension {name} will be loaded on first use.")
+
+    def _lazy_command(self, name: str) -> Callable[..., Coroutine[Any, Any, None]]:
+        """Return a command callback which loads the extension `name` and invokes the real command instead."""
+        async def load_and_invoke(ctx: commands.Context, *, _arguments: str = None) -> None:
+            """Load the extension this command belongs to, then invoke the command again."""
+            if name not in self.extensions:  # Another invocation may have loaded it since this one was parsed.
+                logger.info(f"Loading extension {name} for its first command invocation.")
+                self.load_extension(name)
+            await self.invoke(await self.get_context(ctx.message))
+
+        return load_and_invoke
+
+    def _lazy_listener(self, name: str, event: str) -> Callable[..., Coroutine[Any, Any, None]]:
+        """Return a listener which loads the extension `name` and passes the event on to its listeners."""
+        async def load_and_dispatch(*args, **kwargs) -> None:
+            """Load the extension this listener belongs to, then run its listeners for the event."""
+            if name not in self.extensions:  # Another stub may have loaded it while this event was being dispatched.
+                logger.info(f"Loading extension {name} for its first {event} event.")
+                self.load_extension(name)
+
+            for cog in tuple(self.cogs.values()):
+                if cog.__module__ != name and not cog.__module__.startswith(f"{name}."):
+                    continue
+                for listener_name, listener in cog.get_listeners():
+                    if listener_name == event:
+                        await listener(*args, **kwargs)
+
+        return load_and_dispatch
+
+    def load_extension(self, name: str, *, package: Optional[str] = None) -> None:
+        """Load an extension, replacing the stubs registered for it if it was going to be loaded lazily."""
+        lazy_extension = self._lazy_extensions.pop(name, None)
+        if lazy_extension:
+            entry_points, stub_commands, stub_listeners = lazy_extension
+            for command in stub_commands:
+                self.remove_command(command.name)
+            for event, listener in stub_listeners:
+                self.remove_listener(listener, event)
+
+        try:
+            super().load_extension(name, package=package)
+        except Exception:
+            if lazy_extension:
+                self.add_lazy_extension(name, entry_points)
+            raise
+
+    def _load_from_module_spec(self, spec: importlib.machinery.ModuleSpec, key: str) -> None:
+        """
+        Load an extension from its module spec, timing its import and `setup` separately.
+
+        If the extension has an `async_setup` coroutine function, it's started in the background.
+        """
+        # Must be done here to avoid a circular import.
+        from bot.utils.extensions import ExtensionLoader
+
+        if isinstance(spec.loader, importlib.machinery.SourceFileLoader):
+            code = None
+            if precompiled := self._precompiled.pop(key, None):
+                path, mtime, precompiled_code = precompiled
+                # Only use it if the file wasn't changed since it was compiled.
+                if path == spec.origin and os.stat(path).st_mtime_ns == mtime:
+                    code = precompiled_code
+            spec.loader = ExtensionLoader(spec.loader.name, spec.loader.path, code)
+
+        start = time.perf_counter()
+        super()._load_from_module_spec(spec, key)
+        load_time = time.perf_counter() - start
+
+        import_time = getattr(spec.loader, "exec_time", 0.0)
+        self.extension_load_times[key] = {"import": import_time, "setup": load_time - import_time}
+        self.stats.timing(f"extensions.{key}.import", import_time * 1000)
+        self.stats.timing(f"extensions.{key}.setup", (load_time - import_time) * 1000)
+
+        if task := self._async_setup_tasks.pop(key, None):
+            task.cancel()  # The extension is being reloaded before its previous async setup finished.
+
+        if async_setup := getattr(self.extensions[key], "async_setup", None):
+            self._async_setup_tasks[key] = self.loop.create_task(self._run_async_setup(key, async_setup))
+
+    async def precompile_extensions(self, names: Iterable[str]) -> None:
+        """
+        Read and compile the source of the extensions `names` in a worker thread.
+
+        The code is used the next time each extension is loaded, so the event loop only has to execute it.
+        """
+        # Must be done here to avoid a circular import.
+        from bot.utils.extensions import compile_module
+
+        paths = {}
+        for name in names:
+            try:
+                spec = importlib.util.find_spec(name)
+            except (ImportError, ValueError):
+                continue
+            if spec and spec.origin and spec.origin.endswith(".py"):
+                paths[name] = spec.origin
+
+        def compile_all() -> dict[str, tuple[str, int, CodeType]]:
+            compiled = {}
+            for name, path in paths.items():
+                try:
+                    code, mtime = compile_module(path)
+                except (OSError, SyntaxError, ValueError):
+                    continue  # Loading the extension normally will raise and report the error.
+                compiled[name] = (path, mtime, code)
+            return compiled
+
+        self._precompiled.update(await asyncio.to_thread(compile_all))
+
+    async def _run_async_setup(self, key: str, async_setup: Callable[["ThreadBot"], Awaitable[None]]) -> None:
+        """Run the `async_setup` function of the extension `key` once the guild is available, timing it."""
+        await self.wait_until_guild_available()
+
+        start = time.perf_counter()
+        try:
+            await async_setup(self)
+        except Exception:
+            logger.exception(f"Async setup of extension {key} failed.")
+            return
+        finally:
+            if self._async_setup_tasks.get(key) is asyncio.current_task():
+                del self._async_setup_tasks[key]
+
+        elapsed = time.perf_counter() - start
+        self.extension_load_times[key]["async_setup"] = elapsed
+        self.stats.timing(f"extensions.{key}.async_setup", elapsed * 1000)
+
+    async def _report_extension_load_times(self) -> None:
+        """Send how long loading each extension took to the dev log, once all async setups finished."""
+        await self.wait_until_guild_available()
+        await asyncio.gather(*self._async_setup_tasks.values(), return_exceptions=True)
+
+        lines = []
+        for key, times in sorted(self.extension_load_times.items(), key=lambda item: -sum(item[1].values())):
+            details = ", ".join(f"{stage} {elapsed * 1000:.1f}ms" for stage, elapsed in times.items())
+            lines.append(f"`{key}`: {details}")
+
+        total = sum(sum(times.values()) for times in self.extension_load_times.values())
+        logger.info(f"Loaded {len(lines)} extensions in {total * 1000:.1f}ms.")
+        await self.send_log("Extensions loaded", f"Total: {total * 1000:.1f}ms\n" + "\n".join(lines))
+
+    async def invoke(self, ctx: commands.Context) -> None:
+        """Record when a command was invoked, before its checks and converters run, and invoke it."""
+        # Done here rather than in an `on_command` listener, since listeners run in their own task
+        # and would only start the timer once the command yields to the event loop.
+        ctx.command_started_at = time.perf_counter()
+        await super().invoke(ctx)
+
+    def dispatch(self, event_name: str, *args, **kwargs) -> None:
+        """Dispatch an event to its listeners, counting it if dispatches are being profiled."""
+        if self.dispatch_profiler:
+            self.dispatch_profiler.record_dispatch(event_name)
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def _run_event(
+        self,
+        coro: Callable[..., Coroutine[Any, Any, Any]],
+        event_name: str,
+        *args,
+        **kwargs
+    ) -> None:
+        """Run a single listener for an event, timing it if dispatches are being profiled."""
+        # Each listener is run in its own task through this method, so it's the only place they can be timed.
+        if not self.dispatch_profiler:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+            return
+
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            self.dispatch_profiler.record_handler(event_name, coro, time.perf_counter() - start)
 
     def add_cog(self, cog: commands.Cog) -> None:
         """Adds a "cog" to the bot and logs the operation."""
         super().add_cog(cog)
         logger.info(f"Cog loaded: {cog.qualified_name}")
 
+    async def start_workers(self) -> None:
+        """Run outbox entries and scheduled actions once the guild is available, so handlers can use the cache."""
+        await self.wait_until_guild_available()
+        self.outbox.start()
+        await self.scheduler.start()
+
     async def check_channels(self) -> None:
         """Verifies that all channel constants refer to channels which exist."""
         await self.wait_until_guild_available()
@@ -97,9 +384,7 @@ class ThreadBot(commands.Bot):
             return
 
         all_channels_ids = [channel.id for channel in self.get_all_channels()]
-        for name, channel_id in vars(constants.Channels).items():
-            if name in ("section", "subsection") or name.startswith("__"):
-                continue
+        for name, channel_id in constants.Channels:
             if channel_id not in all_channels_ids:
                 logger.error(f'Channel "{name}" with ID {channel_id} missing')
 
@@ -154,20 +439,22 @@ class ThreadBot(commands.Bot):
         await self._guild_available.wait()
 
     async def close(self) -> None:
-        """Close the Discord connection and statsd client."""
+        """Close the Discord connection, database, and statsd client."""
         # Wait until all tasks that have to be completed before bot is closing is done
         logger.info("Waiting for tasks before closing.")
         await asyncio.gather(*self.closing_tasks)
 
+        self.lag_monitor.stop()
+        self.outbox.stop()
+        self.scheduler.stop()
+        self.thread_ops.close()
         await super().close()
+        await self.db.close()
 
-        if self.stats._transport:
-            self.stats._transport.close()
-
-        if self._statsd_timerhandle:
-            self._statsd_timerhandle.cancel()
+        self.stats.close()
 
     async def login(self, *args, **kwargs) -> None:
-        """Re-create the stats socket before logging into Discord."""
+        """Re-create the stats socket and start monitoring the event loop before logging into Discord."""
         await self.stats.create_socket()
+        self.lag_monitor.start()
         await super().login(*args, **kwargs)
@@ -11,6 +11,7 @@ their default values from `config-default.yml`.
 """
 
 import os
+import typing
 from collections.abc import Mapping
 from enum import Enum
 from pathlib import Path
@@ -78,10 +79,6 @@ yaml.SafeLoader.add_constructor("!JOIN", _join_var_constructor)
 yaml.SafeLoader.add_constructor("!REQUIRED_ENV", _env_var_constructor)
 
 
-with open("config-default.yml", encoding="UTF-8") as f:
-    _CONFIG_YAML = yaml.safe_load(f)
-
-
 def _recursive_update(original, new):
     """
     Helper method which implements a recursive `dict.update`
@@ -101,20 +98,13 @@ def _recursive_update(original, new):
             original[key] = new[key]
 
 
-if Path("config.yml").exists():
-    logger.info("Found `config.yml` file, loading constants from it.")
-    with open("config.yml", encoding="UTF-8") as f:
-        user_config = yaml.safe_load(f)
-    _recursive_update(_CONFIG_YAML, user_config)
-
-
-def check_required_keys(keys):
+def check_required_keys(config, keys):
     """
     Verifies that keys that are set to be required are present in the
     loaded configuration.
     """
     for key_path in keys:
-        lookup = _CONFIG_YAML
+        lookup = config
         try:
             for key in key_path.split('.'):
                 lookup = lookup[key]
@@ -128,18 +118,162 @@ def check_required_keys(keys):
             raise
 
 
-try:
-    required_keys = _CONFIG_YAML['config']['required_keys']
-except KeyError:
-    pass
-else:
-    check_required_keys(required_keys)
+def load_config():
+    """
+    Parses `config-default.yml`, updates it with `config.yml` if it
+    exists, and checks that the required keys are present.
+
+    Only reads files, so it can be run in a thread.
+    """
+    with open("config-default.yml", encoding="UTF-8") as f:
+        config = yaml.safe_load(f)
+
+    if Path("config.yml").exists():
+        logger.info("Found `config.yml` file, loading constants from it.")
+        with open("config.yml", encoding="UTF-8") as f:
+            user_config = yaml.safe_load(f)
+        _recursive_update(config, user_config)
+
+    try:
+        required_keys = config['config']['required_keys']
+    except KeyError:
+        pass
+    else:
+        check_required_keys(config, required_keys)
+
+    return config
+
+
+_CONFIG_YAML = load_config()
+
+# Maps the names of the configuration sections to their classes, to compile them again on reload.
+_SECTIONS = {}
+
+# Shown in place of the values of secret configuration fields, such as the bot's token.
+REDACTED = "<redacted>"
+
+# Callables run after the configuration is reloaded.
+_subscribers = []
+
+
+def _coerce(dotted_path, value, annotation):
+    """
+    Returns the configuration `value` in the form it should be stored in
+    if it matches the type `annotation`, otherwise raises a TypeError.
+    """
+    origin = typing.get_origin(annotation) or annotation
+    args = typing.get_args(annotation)
+
+    if origin is typing.Union:
+        for arg in args:
+            try:
+                return _coerce(dotted_path, value, arg)
+            except TypeError:
+                continue
+    elif annotation is type(None):
+        if value is None:
+            return None
+    elif origin is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    elif isinstance(value, origin) and not (origin is int and isinstance(value, bool)):
+        if origin is list:
+            return tuple(
+                _coerce(f"{dotted_path}[{i}]", item, args[0]) if args else item
+                for i, item in enumerate(value)
+            )
+        return value
+
+    raise TypeError(dotted_path)
+
+
+def _validate(dotted_path, value, annotation, *, secret=False):
+    """
+    Checks that the configuration `value` at `dotted_path` matches the type `annotation`,
+    returning it in the form it should be stored in.
+
+    Integers are accepted for floats, `Optional` and other unions are supported, and
+    lists are converted to tuples so they can't be modified. The value of a `secret`
+    is left out of the error logged when it doesn't match.
+    """
+    try:
+        return _coerce(dotted_path, value, annotation)
+    except TypeError:
+        shown = REDACTED if secret else repr(value)
+        logger.critical(
+            f"The configuration for `{dotted_path}` must be of type `{annotation}`, "
+            f"but `{shown}` is of type `{type(value).__name__}`."
+        )
+        raise
+
+
+class ConfigSection:
+    """
+    Base class of the configuration sections compiled by `YAMLGetter`.
+
+    Every field is stored in a slot, so reading one is a plain attribute
+    access. Sections are immutable once compiled. The values of the fields
+    named in `secret_fields` are redacted from its repr.
+    """
+
+    __slots__ = ()
+
+    section = None
+    subsection = None
+    secret_fields = ()
+
+    def __init__(self, config):
+        """Loads and validates every annotated field of the section from the parsed `config`."""
+        path = (self.section,) if self.subsection is None else (self.section, self.subsection)
+
+        lookup = config
+        try:
+            for key in path:
+                lookup = lookup[key]
+        except (KeyError, TypeError):
+            logger.critical(f"The configuration section `{'.'.join(path)}` is required, but was not found.")
+            raise KeyError('.'.join(path))
+
+        for name, annotation in self.__annotations__.items():
+            dotted_path = '.'.join((*path, name))
+            try:
+                value = lookup[name]
+            except KeyError:
+                logger.critical(f"A configuration for `{dotted_path}` is required, but was not found.")
+                raise
+            secret = name in self.secret_fields
+            object.__setattr__(self, name, _validate(dotted_path, value, annotation, secret=secret))
+
+    def __getattr__(self, name):
+        # Only called when there's no slot with this name.
+        if name != name.lower():
+            return getattr(self, name.lower())
+        raise AttributeError(f"{type(self).__name__!r} has no configuration variable {name!r}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__!r} configuration is read-only")
+
+    def __getitem__(self, name):
+        return getattr(self, name.lower())
+
+    def __iter__(self):
+        """Return generator of key: value pairs of current constants class' config values."""
+        for name in self.__slots__:
+            yield name, getattr(self, name)
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={REDACTED if name in self.secret_fields else repr(value)}" for name, value in self
+        )
+        return f"{type(self).__name__}({fields})"
 
 
 class YAMLGetter(type):
     """
-    Implements a custom metaclass used for accessing
-    configuration data by simply accessing class attributes.
+    Implements a custom metaclass which compiles configuration
+    section classes into immutable objects, once, when the class
+    is defined. Every annotated attribute becomes a slot holding
+    the value from the configuration, checked against the
+    annotation, so missing or wrongly typed keys fail at startup.
     Supports getting configuration from up to two levels
     of nested configuration through `section` and `subsection`.
 
@@ -162,6 +296,9 @@ class YAMLGetter(type):
             section = "bot"
             subsection = "prefixes"
 
+            direct_message: str
+            guild: str
+
         # Usage in Python code
         from config import Prefixes
         def get_prefix(bot, message):
@@ -170,40 +307,23 @@ class YAMLGetter(type):
             return Prefixes.guild
     """
 
-    subsection = None
-
-    def __getattr__(cls, name):
-        name = name.lower()
-
-        try:
-            if cls.subsection is not None:
-                return _CONFIG_YAML[cls.section][cls.subsection][name]
-            return _CONFIG_YAML[cls.section][name]
-        except KeyError as e:
-            dotted_path = '.'.join(
-                (cls.section, cls.subsection, name)
-                if cls.subsection is not None else (cls.section, name)
-            )
-            # Only an INFO logger since this can be caught through `hasattr` or `getattr`.
-            logger.info(f"Tried accessing configuration variable at `{dotted_path}`, but it could not be found.")
-            raise AttributeError(repr(name)) from e
-
-    def __getitem__(cls, name):
-        return cls.__getattr__(name)
-
-    def __iter__(cls):
-        """Return generator of key: value pairs of current constants class' config values."""
-        for name in cls.__annotations__:
-            yield name, getattr(cls, name)
+    def __new__(mcs, name, bases, namespace):
+        namespace["__slots__"] = tuple(namespace.get("__annotations__", ()))
+        section_class = type(name, (ConfigSection, *bases), namespace)
+        _SECTIONS[name] = section_class
+        return section_class(_CONFIG_YAML)
 
 
 # Dataclasses
 class Bot(metaclass=YAMLGetter):
     section = "bot"
+    secret_fields = ("token",)
 
     prefix: str
     token: str
     name: str
+    lazy_extensions: list
+    watch_config: bool
 
 
 class Stats(metaclass=YAMLGetter):
@@ -212,6 +332,36 @@ class Stats(metaclass=YAMLGetter):
 
     presence_update_timeout: int
     statsd_host: str
+    buffered: bool
+    flush_interval: float
+    aggregate_interval: float
+    timer_sample_rate: float
+    profile_dispatch: bool
+
+
+class Database(metaclass=YAMLGetter):
+    section = "bot"
+    subsection = "database"
+
+    path: str
+
+
+class MessageCache(metaclass=YAMLGetter):
+    section = "bot"
+    subsection = "message_cache"
+
+    size: int
+    channels: list[str]
+
+
+class LagMonitor(metaclass=YAMLGetter):
+    section = "bot"
+    subsection = "lag_monitor"
+
+    interval: float
+    threshold: float
+    report_interval: float
+    alert_cooldown: float
 
 
 class Guild(metaclass=YAMLGetter):
@@ -239,6 +389,13 @@ class Roles(metaclass=YAMLGetter):
     core_developers: int
 
 
+class Nominations(metaclass=YAMLGetter):
+    section = "nominations"
+
+    archive_duration: typing.Optional[int]
+    archive_after: typing.Optional[float]
+
+
 class URLs(metaclass=YAMLGetter):
     section = "urls"
 
@@ -270,21 +427,94 @@ class ThreadArchiveTimes(Enum):
     WEEK = 10080
 
 
-STAFF_ROLES = (
-    Roles.admins,
-    Roles.mod_team,
-    Roles.moderators,
-    Roles.helpers
-)
+def _staff_roles():
+    return (
+        Roles.admins,
+        Roles.mod_team,
+        Roles.moderators,
+        Roles.helpers
+    )
+
+
+def _moderation_roles():
+    return (
+        Roles.admins,
+        Roles.mod_team,
+        Roles.moderators
+    )
+
+
+STAFF_ROLES = _staff_roles()
+MODERATION_ROLES = _moderation_roles()
+
+
+def subscribe(callback):
+    """
+    Registers `callback` to be called without arguments every time
+    the configuration is reloaded, to update values derived from it.
+    """
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    """Stops calling `callback` when the configuration is reloaded."""
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def compile_sections(config):
+    """
+    Compiles and validates every configuration section from the
+    parsed `config`, without applying them.
+
+    Raises the same errors as loading the configuration at startup,
+    and can be run in a thread.
+    """
+    return {name: section_class(config) for name, section_class in _SECTIONS.items()}
+
+
+def apply_config(config, sections):
+    """
+    Replaces every configuration section with the ones compiled by
+    `compile_sections`, then notifies the subscribers.
+
+    Must be called from the event loop, so no coroutine can see a mix
+    of old and new sections. Code that imported a section by name
+    keeps the old one, so read them as `constants.<Section>`.
+    """
+    global _CONFIG_YAML, STAFF_ROLES, MODERATION_ROLES
+
+    _CONFIG_YAML = config
+    globals().update(sections)
+    STAFF_ROLES = _staff_roles()
+    MODERATION_ROLES = _moderation_roles()
+
+    for callback in tuple(_subscribers):
+        try:
+            callback()
+        except Exception:
+            logger.exception(f"Failed to notify {callback!r} of the reloaded configuration.")
+
+
+# Seconds of work between yields to the event loop when scanning with bot.utils.helpers.budgeted
+ITERATION_TIME_BUDGET = 0.002
+
+# Maximum amount of threads whose first message is fetched at the same time when searching for a vote's thread
+THREAD_PROBE_CONCURRENCY = 5
+
+# Maximum amount of vote message -> thread mappings kept by the Nominations cog before evicting the oldest
+VOTE_THREAD_INDEX_SIZE = 1000
 
-MODERATION_ROLES = (
-    Roles.admins,
-    Roles.mod_team,
-    Roles.moderators
-)
+# How many thread operations are made per Discord rate limit bucket, as (operations, seconds)
+THREAD_OPERATION_LIMITS = {
+    "create_thread": (5, 10.0),
+    "send_message": (5, 5.0),
+    "edit_thread": (5, 10.0),
+}
+THREAD_OPERATION_DEFAULT_LIMIT = (5, 5.0)
 
-# Amount of elements in each chunk of a sequence when using bot.utils.helpers.chunked_find
-CHUNKED_FIND_CHUNK_SIZE = 200
+# Seconds after which a vote whose final message wasn't posted is forgotten
+VOTE_ASSEMBLY_TIMEOUT = 300
 
 # Debug mode
 DEBUG_MODE: bool = os.environ.get("DEBUG", "true").lower() == "true"
@@ -0,0 +1,147 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+from bot import logger
+
+T = TypeVar("T")
+
+MEMORY_PATH = ":memory:"
+
+
+class Database:
+    """
+    A SQLite database accessed from a single worker thread, so queries never block the event loop.
+
+    Writes are queued and committed together in batches, either when `batch_size` writes are pending
+    or `batch_interval` seconds after the first pending write, whichever happens first.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        path: Optional[str] = None,
+        *,
+        batch_interval: float = 1.0,
+        batch_size: int = 100
+    ):
+        self.path = path or MEMORY_PATH
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+
+        self._loop = loop
+        # A single worker, so the connection is only ever used from the thread that created it.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+        self._connection: Optional[sqlite3.Connection] = None
+
+        self._pending: list[tuple[str, Iterable[Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    @property
+    def persistent(self) -> bool:
+        """Whether the data is kept on disk, as opposed to only living for the lifetime of the process."""
+        return self.path != MEMORY_PATH
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection, opening it first if needed. Must only be called from the worker thread."""
+        if self._connection is None:
+            if self.persistent:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path)
+            self._connection.row_factory = sqlite3.Row
+            logger.info(f"Opened database at {self.path}")
+        return self._connection
+
+    async def _run(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        """Run `func` with the connection in the worker thread."""
+        return await self._loop.run_in_executor(self._executor, lambda: func(self._connect()))
+
+    async def executescript(self, script: str) -> None:
+        """Execute a script of SQL statements, such as a schema, and commit it immediately."""
+        await self._run(lambda connection: connection.executescript(script))
+
+    async def fetchall(self, query: str, params: Iterable[Any] = ()) -> list[sqlite3.Row]:
+        """Return all rows of `query`. Writes that haven't been flushed yet aren't visible."""
+        return await self._run(lambda connection: connection.execute(query, params).fetchall())
+
+    async def fetchone(self, query: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
+        """Return the first row of `query`, or None if there is none."""
+        return await self._run(lambda connection: connection.execute(query, params).fetchone())
+
+    def write(self, statement: str, params: Iterable[Any] = ()) -> asyncio.Future:
+        """
+        Queue `statement` to be executed in the next batch.
+
+        The returned future completes once the batch is committed. It doesn't need to be awaited,
+        as failures are logged when the batch is flushed.
+        """
+        future = self._loop.create_future()
+        # Mark exceptions as retrieved so fire-and-forget writes don't warn about them a second time.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append((statement, params, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.batch_interval, self._schedule_flush)
+
+        return future
+
+    def _schedule_flush(self) -> None:
+        """Start a task to flush the pending writes."""
+        task = self._loop.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self) -> None:
+        """Execute and commit all pending writes in a single transaction."""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        def execute_batch(connection: sqlite3.Connection) -> list[Optional[BaseException]]:
+            errors = []
+            for statement, params, _ in batch:
+                try:
+                    connection.execute(statement, params)
+                except sqlite3.Error as e:
+                    errors.append(e)
+                else:
+                    errors.append(None)
+            connection.commit()
+            return errors
+
+        try:
+            errors = await self._run(execute_batch)
+        except Exception as e:
+            logger.exception(f"Failed to commit a batch of {len(batch)} database writes.")
+            errors = [e] * len(batch)
+
+        for (statement, _, future), error in zip(batch, errors):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                logger.error(f"Database write failed: {error.__class__.__name__}: {error} ({statement!r})")
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        """Flush pending writes and close the connection."""
+        await asyncio.gather(*self._flush_tasks)
+        await self.flush()
+
+        def close_connection(connection: sqlite3.Connection) -> None:
+            connection.close()
+            self._connection = None
+
+        if self._connection is not None:
+            await self._run(close_connection)
+        self._executor.shutdown(wait=False)
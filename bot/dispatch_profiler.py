@@ -0,0 +1,66 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bot.async_stats import AsyncStatsClient
+
+
+@dataclass
+class HandlerStats:
+    """How often a listener handled an event, and how long it took."""
+
+    event: str
+    listener: str
+    calls: int = 0
+    total: float = 0.0
+    peak: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        """The average time a call took, in seconds."""
+        return self.total / self.calls if self.calls else 0.0
+
+
+def listener_name(listener: Callable[..., Any]) -> str:
+    """Return a readable name for `listener`, including the class it's bound to."""
+    if instance := getattr(listener, "__self__", None):
+        return f"{type(instance).__name__}.{listener.__name__}"
+    return getattr(listener, "__qualname__", repr(listener))
+
+
+class DispatchProfiler:
+    """
+    Records how many times each event was dispatched, and the calls, cumulative and peak time of every listener.
+
+    Listener times are also sent to statsd as `dispatch.<event>.<listener>` timers.
+    """
+
+    def __init__(self, stats: "AsyncStatsClient"):
+        self.stats = stats
+        self.dispatches: Counter[str] = Counter()
+        self.handlers: dict[tuple[str, str], HandlerStats] = {}
+
+    def record_dispatch(self, event: str) -> None:
+        """Count a dispatch of `event`, whether or not anything listens to it."""
+        self.dispatches[event] += 1
+
+    def record_handler(self, event: str, listener: Callable[..., Any], elapsed: float) -> None:
+        """Record that `listener` took `elapsed` seconds to handle `event`."""
+        name = listener_name(listener)
+        if (handler := self.handlers.get((event, name))) is None:
+            handler = self.handlers[event, name] = HandlerStats(event, name)
+
+        handler.calls += 1
+        handler.total += elapsed
+        handler.peak = max(handler.peak, elapsed)
+        self.stats.timing(f"dispatch.{event}.{name}", elapsed * 1000)
+
+    def top(self, count: int, key: str = "total") -> list[HandlerStats]:
+        """Return the `count` hottest listeners, sorted by the HandlerStats attribute `key`."""
+        return sorted(self.handlers.values(), key=lambda handler: getattr(handler, key), reverse=True)[:count]
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        self.dispatches.clear()
+        self.handlers.clear()
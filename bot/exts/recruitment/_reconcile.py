@@ -0,0 +1,115 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+import discord
+
+from bot import constants, logger
+from bot.exts.recruitment._votes import THREAD_NAME_PREFIX, VoteAssembler
+from bot.utils.helpers import budgeted
+
+if TYPE_CHECKING:
+    from bot.exts.recruitment.nominations import Nominations
+
+CHECKPOINT = "reconcile"
+# How far back to look for votes when there's no checkpoint yet, in seconds.
+FIRST_RUN_LOOKBACK = 7 * 24 * 60 * 60
+# How far before the checkpoint open votes can move the start of the scan, in seconds.
+OPEN_VOTE_LOOKBACK = 30 * 24 * 60 * 60
+# Amount of messages processed between progress reports and checkpoint updates.
+PROGRESS_INTERVAL = 1000
+
+
+@dataclass
+class ReconciliationReport:
+    """What a reconciliation pass found and fixed."""
+
+    scanned: int = 0
+    votes: int = 0
+    created: int = 0
+    archived: int = 0
+    closed: int = 0
+
+
+async def reconcile_votes(nominations: "Nominations", channel: discord.TextChannel) -> ReconciliationReport:
+    """
+    Create the threads of votes posted, and archive the threads of votes deleted, while the bot was offline.
+
+    The voting channel's history is streamed oldest first, from the last checkpoint or the oldest open vote,
+    whichever is older. Votes ending in it without a thread get one, and open votes whose message isn't in it
+    were deleted. Both go through the outbox, like live votes. Only the ids of the open votes are kept in memory.
+
+    Open votes older than `OPEN_VOTE_LOOKBACK` before the checkpoint don't move the start of the scan. Instead,
+    they are closed if their thread is no longer active, as it was archived or deleted while the bot was offline.
+    """
+    bot, store = nominations.bot, nominations.store
+    report = ReconciliationReport()
+    start = time.perf_counter()
+
+    # Votes which should be archived if their message no longer exists.
+    open_votes = set(await store.get_open_votes())
+    async for thread in budgeted(channel.threads):
+        if not thread.archived and thread.name.startswith(THREAD_NAME_PREFIX):
+            open_votes.add(thread.id)
+
+    checkpoint = await store.get_checkpoint(CHECKPOINT)
+    if checkpoint is None:
+        lookback = datetime.now(timezone.utc) - timedelta(seconds=FIRST_RUN_LOOKBACK)
+        checkpoint = discord.utils.time_snowflake(lookback)
+
+    # Without a limit, a single vote whose thread was never seen archived would make every scan start from it.
+    oldest = discord.utils.snowflake_time(checkpoint) - timedelta(seconds=OPEN_VOTE_LOOKBACK)
+    stale_votes = {message_id for message_id in open_votes if message_id < discord.utils.time_snowflake(oldest)}
+    open_votes -= stale_votes
+    async for message_id in budgeted(stale_votes):
+        # Active threads are always cached, and share the id of the vote they were started from.
+        thread = channel.get_thread(message_id)
+        if not thread or thread.archived:
+            store.record_vote_closed(message_id)
+            report.closed += 1
+
+    after = min(checkpoint, min(open_votes) - 1) if open_votes else checkpoint
+
+    since = discord.utils.snowflake_time(after).strftime("%Y-%m-%d %H:%M UTC")
+    await bot.send_log(
+        "Reconciling nominations",
+        f"Scanning <#{channel.id}> since {since}, with {len(open_votes)} open votes."
+    )
+
+    # Votes are assembled by the time their messages were posted, rather than when they are read.
+    posted_at = 0.0
+    votes = VoteAssembler(constants.VOTE_ASSEMBLY_TIMEOUT, clock=lambda: posted_at)
+
+    async for message in channel.history(limit=None, after=discord.Object(after), oldest_first=True):
+        posted_at = message.created_at.timestamp()
+        report.scanned += 1
+        open_votes.discard(message.id)
+
+        if vote := votes.feed(message):
+            report.votes += 1
+            if not nominations.has_thread(channel, message.id) and not await store.get_thread_id(message.id):
+                await nominations.queue_create(message, vote.member_name)
+                report.created += 1
+
+        if report.scanned % PROGRESS_INTERVAL == 0:
+            store.set_checkpoint(CHECKPOINT, message.id)
+            logger.info(f"Reconciling nominations: scanned {report.scanned} messages, found {report.votes} votes.")
+            await bot.send_log("Reconciling nominations", f"Scanned {report.scanned} messages so far.")
+
+    if report.scanned:
+        store.set_checkpoint(CHECKPOINT, message.id)
+
+    for message_id in open_votes:
+        await nominations.queue_archive(message_id, channel.id)
+        report.archived += 1
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Reconciled nominations in {elapsed:.1f}s: {report}")
+    await bot.send_log(
+        "Reconciled nominations",
+        f"Scanned {report.scanned} messages and found {report.votes} votes in {elapsed:.1f}s.\n"
+        f"Queued {report.created} missing threads to be created and {report.archived} threads of deleted votes "
+        f"to be archived. Closed {report.closed} old votes without an active thread."
+    )
+    return report
@@ -0,0 +1,87 @@
+import time
+from typing import Optional
+
+from bot.database import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nomination_threads (
+    message_id  INTEGER PRIMARY KEY,
+    thread_id   INTEGER NOT NULL,
+    member_name TEXT,
+    created_at  REAL NOT NULL,
+    archived_at REAL
+);
+CREATE INDEX IF NOT EXISTS nomination_threads_thread_id ON nomination_threads (thread_id);
+CREATE TABLE IF NOT EXISTS nomination_checkpoints (
+    name        TEXT PRIMARY KEY,
+    message_id  INTEGER NOT NULL,
+    updated_at  REAL NOT NULL
+);
+"""
+
+
+class NominationStore:
+    """Records which thread belongs to which vote message, so it can be found again after a restart."""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def create_tables(self) -> None:
+        """Create the tables used by the store if they don't exist yet."""
+        await self.db.executescript(SCHEMA)
+
+    def record_thread(self, message_id: int, thread_id: int, member_name: Optional[str]) -> None:
+        """Record that a thread was created for the vote `message_id`."""
+        self.db.write(
+            "INSERT OR REPLACE INTO nomination_threads (message_id, thread_id, member_name, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (message_id, thread_id, member_name, time.time())
+        )
+
+    def record_archive(self, message_id: int, thread_id: int) -> None:
+        """Record that the thread of the vote `message_id` was archived."""
+        now = time.time()
+        self.db.write(
+            "INSERT INTO nomination_threads (message_id, thread_id, created_at, archived_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (message_id) DO UPDATE SET archived_at = excluded.archived_at",
+            (message_id, thread_id, now, now)
+        )
+
+    def record_thread_archived(self, thread_id: int) -> None:
+        """Record that `thread_id` was archived or deleted, if it belongs to a known vote."""
+        self.db.write(
+            "UPDATE nomination_threads SET archived_at = ? WHERE thread_id = ? AND archived_at IS NULL",
+            (time.time(), thread_id)
+        )
+
+    def record_vote_closed(self, message_id: int) -> None:
+        """Record that the vote `message_id` no longer has a thread to archive, such as when it was deleted."""
+        self.db.write(
+            "UPDATE nomination_threads SET archived_at = ? WHERE message_id = ? AND archived_at IS NULL",
+            (time.time(), message_id)
+        )
+
+    async def get_thread_id(self, message_id: int) -> Optional[int]:
+        """Return the id of the unarchived thread of the vote `message_id`, if one is known."""
+        row = await self.db.fetchone(
+            "SELECT thread_id FROM nomination_threads WHERE message_id = ? AND archived_at IS NULL",
+            (message_id,)
+        )
+        return row["thread_id"] if row else None
+
+    async def get_open_votes(self) -> list[int]:
+        """Return the message ids of the votes whose thread isn't known to be archived."""
+        rows = await self.db.fetchall("SELECT message_id FROM nomination_threads WHERE archived_at IS NULL")
+        return [row["message_id"] for row in rows]
+
+    async def get_checkpoint(self, name: str) -> Optional[int]:
+        """Return the id of the last message processed by `name`, if it ever processed one."""
+        row = await self.db.fetchone("SELECT message_id FROM nomination_checkpoints WHERE name = ?", (name,))
+        return row["message_id"] if row else None
+
+    def set_checkpoint(self, name: str, message_id: int) -> None:
+        """Record that `name` processed every message up to `message_id`."""
+        self.db.write(
+            "INSERT OR REPLACE INTO nomination_checkpoints (name, message_id, updated_at) VALUES (?, ?, ?)",
+            (name, message_id, time.time())
+        )
@@ -0,0 +1,87 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+import discord
+
+from bot import logger
+
+NOMINATION_MESSAGE_REGEX = re.compile(
+    r"<@!?\d+> \((.+)#\d{4}\) for Helper!\n\n\*\*Nominated by:\*\*",
+    re.MULTILINE
+)
+
+# When nominations are posted manually, the Discord message box standarises the unicode emojis to :thumbsup:
+NOMINATION_ENDING_TEXT = "react :+1: for approval, or :-1: for disapproval*."
+
+# Start of the names of the threads created for votes.
+THREAD_NAME_PREFIX = "Nomination"
+
+
+class PartialVote(NamedTuple):
+    """The start of a vote whose final message hasn't been posted yet."""
+
+    member_name: str
+    start_message_id: int
+    started_at: float
+
+
+class Vote(NamedTuple):
+    """A vote whose final message was posted, and which needs a thread."""
+
+    member_name: Optional[str]
+    start_message_id: int
+    end_message_id: int
+
+
+class VoteAssembler:
+    """
+    Assembles votes which can span several messages, due to long nomination reasons.
+
+    Every author has at most one vote in progress, so votes posted by different people at the same time don't mix.
+    A new vote from an author replaces the one they had in progress, and votes that haven't ended after `timeout`
+    seconds are dropped. Messages older than the start of the author's vote in progress are ignored.
+    """
+
+    def __init__(self, timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        # Maps author ids to their vote in progress, oldest first, so expired votes are always at the front.
+        self.pending: OrderedDict[int, PartialVote] = OrderedDict()
+
+    def expire(self) -> None:
+        """Drop the votes in progress that started more than `timeout` seconds ago."""
+        deadline = self.clock() - self.timeout
+        while self.pending:
+            author_id, partial = next(iter(self.pending.items()))
+            if partial.started_at > deadline:
+                break
+            del self.pending[author_id]
+            logger.warning(f"Dropped the vote for {partial.member_name}, its final message never came.")
+
+    def feed(self, message: discord.Message) -> Optional[Vote]:
+        """Process `message`, and return the vote it ends, if it ends one."""
+        self.expire()
+
+        author_id = message.author.id
+        if match := NOMINATION_MESSAGE_REGEX.match(message.content):
+            if previous := self.pending.get(author_id):
+                if previous.start_message_id > message.id:
+                    return None  # Older than the vote in progress, it must have been delivered late.
+                logger.warning(f"New vote found before the vote for {previous.member_name} ended, replacing it.")
+                del self.pending[author_id]  # Re-added below, at the end.
+            self.pending[author_id] = PartialVote(match.group(1), message.id, self.clock())
+
+        if not message.content.endswith(NOMINATION_ENDING_TEXT):
+            return None  # Votes could be split into multiple messages, the vote ends on the final message
+
+        partial = self.pending.get(author_id)
+        if partial and partial.start_message_id > message.id:
+            return None
+        if partial:
+            del self.pending[author_id]
+            return Vote(partial.member_name, partial.start_message_id, message.id)
+
+        logger.error("Valid end message found, but no vote in progress from its author to create the thread for!")
+        return Vote(None, message.id, message.id)
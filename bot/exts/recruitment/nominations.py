@@ -1,20 +1,21 @@
-import re
-from typing import Optional
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Optional
 
 import discord
 from discord.ext import commands
 
 from bot import constants, logger
 from bot.bot import ThreadBot
-from bot.utils.helpers import get_thread_from_message_id
+from bot.exts.recruitment._reconcile import CHECKPOINT, reconcile_votes
+from bot.exts.recruitment._store import NominationStore
+from bot.exts.recruitment._votes import THREAD_NAME_PREFIX, VoteAssembler
+from bot.utils.helpers import ThreadResolver, budgeted
 
-NOMINATION_MESSAGE_REGEX = re.compile(
-    r"<@!?\d+> \((.+)#\d{4}\) for Helper!\n\n\*\*Nominated by:\*\*",
-    re.MULTILINE
-)
-
-# When nominations are posted manually, the Discord message box standarises the unicode emojis to :thumbsup:
-NOMINATION_ENDING_TEXT = "react :+1: for approval, or :-1: for disapproval*."
+# Error code of the response to creating a thread from a message which already has one.
+THREAD_ALREADY_CREATED = 160004
 
 
 class Nominations(commands.Cog):
@@ -22,39 +23,96 @@ class Nominations(commands.Cog):
 
     def __init__(self, bot: ThreadBot) -> None:
         self.bot = bot
-        # Temporarily stores the name of the member who's vote just got posted.
-        # Need to cache this as votes can span multiple messages (due to long nomination reasons).
-        self.nominated_member_name: Optional[str] = None
+        # Keeps track of the votes being posted, as they can span multiple messages (due to long nomination reasons).
+        self.votes = VoteAssembler(constants.VOTE_ASSEMBLY_TIMEOUT)
+        # Maps vote message ids to the ids of the threads created from them, oldest first.
+        # Kept up to date by the thread events so archiving doesn't need to search for the thread.
+        self.vote_threads: OrderedDict[int, int] = OrderedDict()
+        # Persists the same mappings, so threads can still be found cheaply after a restart.
+        self.store = NominationStore(bot.db)
+        self.bot.loop.create_task(self.store.create_tables())
+        self.resolver = ThreadResolver(bot)
+        # Messages are only checkpointed once the ones posted while the bot was offline were reconciled.
+        self.reconcile_task: Optional[asyncio.Task] = None
+        self.reconciled = False
+
+        self.update_archive_time()
+        constants.subscribe(self.update_archive_time)
+
+        self.bot.outbox.register("nominations.create_thread", self.create_vote_thread)
+        self.bot.outbox.register("nominations.archive_thread", self.archive_vote_thread)
+        self.bot.scheduler.register("nominations.archive_thread", self.scheduled_archive)
+
+    def cog_unload(self) -> None:
+        """Stop following configuration reloads, running thread operations, and reconciling."""
+        if self.reconcile_task:
+            self.reconcile_task.cancel()
+        constants.unsubscribe(self.update_archive_time)
+        self.bot.outbox.unregister("nominations.create_thread")
+        self.bot.outbox.unregister("nominations.archive_thread")
+        self.bot.scheduler.unregister("nominations.archive_thread")
 
-        if constants.DEBUG_MODE:
+    def update_archive_time(self) -> None:
+        """Set how long new threads stay open without activity from the configuration."""
+        if constants.Nominations.archive_duration is not None:
+            self.archive_time = constants.Nominations.archive_duration
+        elif constants.DEBUG_MODE:
             self.archive_time = constants.ThreadArchiveTimes.DAY.value
         else:
             self.archive_time = constants.ThreadArchiveTimes.WEEK.value
 
+    def index_thread(self, message_id: int, thread_id: int) -> None:
+        """Record that the vote `message_id` has the thread `thread_id`, evicting the oldest entry when full."""
+        self.vote_threads[message_id] = thread_id
+        self.vote_threads.move_to_end(message_id)
+        if len(self.vote_threads) > constants.VOTE_THREAD_INDEX_SIZE:
+            self.vote_threads.popitem(last=False)
+
+    def unindex_thread(self, thread_id: int) -> None:
+        """Remove the index entry for `thread_id`, if there is one."""
+        # Threads started from a message share that message's id, so this is normally a direct hit.
+        if self.vote_threads.get(thread_id) == thread_id:
+            del self.vote_threads[thread_id]
+            return
+
+        for message_id, indexed_thread_id in self.vote_threads.items():
+            if indexed_thread_id == thread_id:
+                del self.vote_threads[message_id]
+                return
+
+    async def index_active_threads(self) -> None:
+        """Index all cached active threads in the voting channel, yielding to the event loop as it goes."""
+        channel = self.bot.get_channel(constants.Channels.nomination_voting)
+        if not channel:
+            logger.warning("Could not find the nomination voting channel to index its threads.")
+            return
+
+        async for thread in budgeted(channel.threads):
+            if not thread.archived:
+                self.index_thread(thread.id, thread.id)
+        logger.info(f"Indexed {len(self.vote_threads)} active nomination threads.")
+
+    async def fetch_thread(self, channel: discord.TextChannel, thread_id: int) -> Optional[discord.Thread]:
+        """Get `thread_id` from the cache, or fetch it if it isn't cached. Return None if it no longer exists."""
+        if thread := channel.get_thread(thread_id):
+            return thread
+
+        try:
+            thread = await self.bot.fetch_channel(thread_id)
+        except (discord.NotFound, discord.Forbidden):
+            return None
+        return thread if isinstance(thread, discord.Thread) else None
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
         """Create a thread on votes sent in the nominations voting channel."""
         if message.channel.id != constants.Channels.nomination_voting:
             return  # Ignore messages not in the voting channel
 
-        if match := NOMINATION_MESSAGE_REGEX.match(message.content):
-            if self.nominated_member_name:
-                logger.error("New vote found, but we still have a name cached! Did two votes come in at the same time?")
-            self.nominated_member_name = match.group(1)
-
-        if not message.content.endswith(NOMINATION_ENDING_TEXT):
-            return  # Votes could be split into multiple messages, create the thread on the final message
-        elif not self.nominated_member_name:
-            logger.error("Valid end message found, but no cached member name to create thread!")
-
-        thread = await message.create_thread(
-            name=f"Nomination - {self.nominated_member_name}",
-            auto_archive_duration=self.archive_time
-        )
-        logger.info(f"Created thread {thread.name}")
-        self.nominated_user_id = None
-        await thread.send(fr"<@&{constants.Roles.mod_team}> <@&{constants.Roles.admins}>")
-        self.bot.stats.incr("thread.nomination.open")
+        if vote := self.votes.feed(message):
+            await self.queue_create(message, vote.member_name)
+        if self.reconciled:
+            self.store.set_checkpoint(CHECKPOINT, message.id)
 
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
@@ -64,17 +122,178 @@ class Nominations(commands.Cog):
         if channel_id != constants.Channels.nomination_voting:
             return  # Ignore messages deleted in other channels
 
+        self.bot.scheduler.cancel("nominations.archive_thread", message_id)
+        # Most deleted messages aren't votes, and finding out for sure would take API requests.
+        if await self.has_known_thread(self.bot.get_channel(channel_id), message_id):
+            await self.queue_archive(message_id, channel_id)
+
+    def has_thread(self, channel: discord.TextChannel, message_id: int) -> bool:
+        """Return whether the vote `message_id` is known to have a thread, without making any requests."""
+        return message_id in self.vote_threads or channel.get_thread(message_id) is not None
+
+    async def has_known_thread(self, channel: Optional[discord.TextChannel], message_id: int) -> bool:
+        """Return whether the message `message_id` is a vote with a cached or recorded thread, without API requests."""
+        if channel and self.has_thread(channel, message_id):
+            return True
+        if self.bot.message_cache is not None and self.bot.message_cache.get_thread_starter(message_id):
+            return True
+        return await self.store.get_thread_id(message_id) is not None
+
+    async def queue_create(self, message: discord.Message, member_name: Optional[str]) -> None:
+        """Record that the vote ending with `message` needs a thread, and wake up the outbox to create it."""
+        # Recorded first, so the thread is still created if creating it fails or the bot restarts.
+        await self.bot.outbox.append(
+            "nominations.create_thread",
+            message.id,
+            {"message_id": message.id, "channel_id": message.channel.id, "member_name": member_name}
+        )
+
+    async def queue_archive(self, message_id: int, channel_id: int) -> None:
+        """Record that the thread of the deleted vote `message_id` needs archiving, and wake up the outbox."""
+        await self.bot.outbox.append(
+            "nominations.archive_thread",
+            message_id,
+            {"message_id": message_id, "channel_id": channel_id}
+        )
+
+    async def reconcile(self) -> None:
+        """Fix the threads of votes posted or deleted while the bot was offline, then start checkpointing."""
+        channel = self.bot.get_channel(constants.Channels.nomination_voting)
+        if not channel:
+            logger.warning("Could not find the nomination voting channel to reconcile its threads.")
+            return
+
+        try:
+            await reconcile_votes(self, channel)
+        except Exception:
+            logger.exception("Failed to reconcile nomination threads.")
+            await self.bot.send_log("Reconciling nominations failed", "Votes posted or deleted offline may be missed.")
+            return
+        self.reconciled = True
+
+    async def create_vote_thread(self, payload: dict[str, Any]) -> None:
+        """Create the thread of the vote ending with the message in `payload`, unless it already has one."""
+        message_id, member_name = payload["message_id"], payload["member_name"]
+        channel: discord.TextChannel = self.bot.get_channel(payload["channel_id"])
+        if channel.get_thread(message_id) or await self.store.get_thread_id(message_id):
+            return  # Created before the bot stopped, or a previous attempt succeeded but failed to report it.
+
+        name = f"{THREAD_NAME_PREFIX} - {member_name}" if member_name else THREAD_NAME_PREFIX
+        try:
+            thread = await self.bot.thread_ops.submit(
+                "create_thread",
+                channel.id,
+                ("create_thread", message_id),
+                functools.partial(
+                    channel.create_thread,
+                    name=name,
+                    message=discord.Object(message_id),
+                    auto_archive_duration=self.archive_time
+                )
+            )
+        except discord.NotFound:
+            logger.info(f"Vote {channel.id}-{message_id} was deleted before its thread was created.")
+            return
+        except discord.HTTPException as e:
+            if e.code != THREAD_ALREADY_CREATED:
+                raise
+            logger.info(f"Vote {channel.id}-{message_id} already has a thread.")
+            return
+
+        logger.info(f"Created thread {thread.name}")
+        self.index_thread(message_id, thread.id)
+        self.store.record_thread(message_id, thread.id, member_name)
+        self.bot.thread_ops.submit_background(
+            "send_message",
+            thread.id,
+            ("ping", thread.id),
+            functools.partial(thread.send, fr"<@&{constants.Roles.mod_team}> <@&{constants.Roles.admins}>")
+        )
+        self.bot.stats.incr("thread.nomination.open")
+
+        if constants.Nominations.archive_after is not None:
+            self.bot.scheduler.schedule(
+                "nominations.archive_thread",
+                message_id,
+                time.time() + constants.Nominations.archive_after * 60 * 60,
+                {"message_id": message_id, "channel_id": channel.id}
+            )
+
+    async def scheduled_archive(self, payload: dict[str, Any]) -> None:
+        """Archive the thread of the vote in `payload`, as it was open for `archive_after` hours."""
+        await self.bot.outbox.append("nominations.archive_thread", payload["message_id"], payload)
+
+    async def archive_vote_thread(self, payload: dict[str, Any]) -> None:
+        """Archive the thread of the deleted vote in `payload`, if it has one that isn't archived yet."""
+        message_id, channel_id = payload["message_id"], payload["channel_id"]
         channel: discord.TextChannel = self.bot.get_channel(channel_id)
-        thread = await get_thread_from_message_id(message_id, channel, self.bot.cached_messages)
+
+        thread = None
+        if thread_id := self.vote_threads.pop(message_id, None):
+            thread = channel.get_thread(thread_id)
+
+        if not thread and (thread_id := await self.store.get_thread_id(message_id)):
+            thread = await self.fetch_thread(channel, thread_id)
+
+        if not thread:
+            thread = await self.resolver.resolve(message_id, channel)
         if not thread:
             logger.info(f"Could not find a thread linked to {channel_id}-{message_id}")
+            # Otherwise the vote stays open, and every reconciliation would try to archive its thread again.
+            self.store.record_vote_closed(message_id)
+            return
+
+        archived = await self.bot.thread_ops.submit(
+            "edit_thread",
+            thread.id,
+            ("archive_thread", thread.id),
+            functools.partial(thread.edit, archived=True),
+            skip=lambda: thread.archived
+        )
+        self.store.record_archive(message_id, thread.id)
+        if archived:
+            logger.info(f"Archived thread {thread.name}")
+            self.bot.stats.incr("thread.nomination.archive")
+
+    # Older discord.py 2.0 builds dispatch thread creation as `on_thread_join`.
+    @commands.Cog.listener("on_thread_join")
+    @commands.Cog.listener()
+    async def on_thread_create(self, thread: discord.Thread) -> None:
+        """Index active threads started in the voting channel."""
+        if thread.parent_id != constants.Channels.nomination_voting or thread.archived:
+            return
+
+        # A thread started from a message has the same id as that message.
+        self.index_thread(thread.id, thread.id)
+
+    @commands.Cog.listener()
+    async def on_thread_update(self, before: discord.Thread, after: discord.Thread) -> None:
+        """Keep the index limited to active threads in the voting channel."""
+        if after.parent_id != constants.Channels.nomination_voting:
             return
 
-        logger.info(f"Archiving thread {thread.name}")
-        await thread.edit(archived=True)
-        self.bot.stats.incr("thread.nomination.archive")
+        if after.archived:
+            self.unindex_thread(after.id)
+            if not before.archived:
+                self.store.record_thread_archived(after.id)
+        elif before.archived:
+            self.index_thread(after.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_thread_delete(self, thread: discord.Thread) -> None:
+        """Drop deleted threads from the index, and close their votes."""
+        if thread.parent_id == constants.Channels.nomination_voting:
+            self.unindex_thread(thread.id)
+            self.store.record_thread_archived(thread.id)
 
 
 def setup(bot: ThreadBot) -> None:
     """Load the Nominations cog."""
     bot.add_cog(Nominations(bot))
+
+
+async def async_setup(bot: ThreadBot) -> None:
+    """Index active threads and reconcile votes posted or deleted offline once the guild is available."""
+    cog = bot.get_cog("Nominations")
+    await cog.index_active_threads()
+    cog.reconcile_task = bot.loop.create_task(cog.reconcile())
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Optional
+
+from discord.ext import commands
+from discord.ext.commands import Context, group
+
+from bot import constants, logger
+from bot.bot import ThreadBot
+
+CONFIG_FILES = ("config-default.yml", "config.yml")
+# How often to check the configuration files for changes when watching them, in seconds.
+POLL_INTERVAL = 2.0
+
+
+def snapshot_config_files() -> dict[str, Optional[int]]:
+    """Return the modification time of each configuration file, or None if it doesn't exist."""
+    mtimes = {}
+    for path in CONFIG_FILES:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtimes[path] = None
+    return mtimes
+
+
+def load_sections() -> tuple[dict, dict[str, constants.ConfigSection]]:
+    """Parse the configuration files and compile every section from them. Runs in a worker thread."""
+    config = constants.load_config()
+    return config, constants.compile_sections(config)
+
+
+def changed_keys(sections: dict[str, constants.ConfigSection]) -> list[str]:
+    """Return the dotted names of the values in `sections` that differ from the ones currently in use."""
+    changes = []
+    for name, section in sections.items():
+        current = dict(getattr(constants, name))
+        for key, value in section:
+            if current.get(key) != value:
+                changes.append(f"{name}.{key}")
+    return changes
+
+
+class Config(commands.Cog):
+    """Reloads the configuration without restarting the bot."""
+
+    def __init__(self, bot: ThreadBot):
+        self.bot = bot
+        self.reload_lock = asyncio.Lock()
+        self.watch_task: Optional[asyncio.Task] = None
+        if constants.Bot.watch_config:
+            self.watch_task = self.bot.loop.create_task(self.watch())
+
+    def cog_unload(self) -> None:
+        """Stop watching the configuration files."""
+        if self.watch_task:
+            self.watch_task.cancel()
+
+    # This cannot be static (must have a __func__ attribute).
+    async def cog_check(self, ctx: Context) -> bool:
+        """Only allow moderators and core developers to invoke the commands in this cog."""
+        return await commands.has_any_role(*constants.MODERATION_ROLES, constants.Roles.core_developers).predicate(ctx)
+
+    @group(name="config", aliases=("cfg",), invoke_without_command=True)
+    async def config_group(self, ctx: Context) -> None:
+        """Manage the bot's configuration."""
+        await ctx.send_help(ctx.command)
+
+    @config_group.command(name="reload", aliases=("r",))
+    async def reload_command(self, ctx: Context) -> None:
+        """
+        Reload the configuration from `config-default.yml` and `config.yml`.
+
+        If the new configuration is invalid, the current one is kept.
+        """
+        await ctx.send(await self.reload())
+
+    async def reload(self) -> str:
+        """Reload the configuration and return a message with the result."""
+        async with self.reload_lock:
+            try:
+                config, sections = await asyncio.to_thread(load_sections)
+            except Exception as e:
+                logger.warning(f"Failed to reload the configuration: {e!r}")
+                return f":x: The configuration is invalid, keeping the current one.```\n{e.__class__.__name__}: {e}```"
+
+            changes = changed_keys(sections)
+            # Nothing awaits between here and the end of the swap, so no coroutine sees a partial update.
+            constants.apply_config(config, sections)
+
+        if not changes:
+            return ":ok_hand: Configuration reloaded, nothing changed."
+        logger.info(f"Reloaded the configuration, changed {', '.join(changes)}.")
+        changed = "\n".join(changes)
+        return f":ok_hand: Configuration reloaded. Changed:```\n{changed}```"
+
+    async def watch(self) -> None:
+        """Reload the configuration whenever one of its files changes."""
+        await self.bot.wait_until_guild_available()
+
+        previous = await asyncio.to_thread(snapshot_config_files)
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+
+            current = await asyncio.to_thread(snapshot_config_files)
+            if current == previous:
+                continue
+            previous = current
+
+            try:
+                result = await self.reload()
+                await self.bot.send_log("Configuration reload", result)
+            except Exception:
+                logger.exception("Failed to reload the configuration after its files changed.")
+
+
+def setup(bot: ThreadBot) -> None:
+    """Load the Config cog."""
+    bot.add_cog(Config(bot))
@@ -3,8 +3,8 @@ import typing as t
 from discord import Embed
 from discord.ext.commands import Cog, Context, errors
 
+from bot import constants
 from bot.bot import ThreadBot, logger
-from bot.constants import Colours
 
 
 class ErrorHandler(Cog):
@@ -18,7 +18,7 @@ class ErrorHandler(Cog):
         """Return an embed that contains the exception."""
         return Embed(
             title=title,
-            colour=Colours.error,
+            colour=constants.Colours.error,
             description=body
         )
 
@@ -1,4 +1,5 @@
 import functools
+import time
 import typing as t
 from enum import Enum
 
@@ -6,9 +7,8 @@ from discord import Embed
 from discord.ext import commands
 from discord.ext.commands import Context, group
 
-from bot import exts, logger
+from bot import constants, exts, logger
 from bot.bot import ThreadBot
-from bot.constants import Colours, Emojis, MODERATION_ROLES, Roles, URLs
 from bot.utils.extensions import EXTENSIONS, unqualify
 
 
@@ -72,7 +72,7 @@ class Extensions(commands.Cog):
     # This cannot be static (must have a __func__ attribute).
     async def cog_check(self, ctx: Context) -> bool:
         """Only allow moderators and core developers to invoke the commands in this cog."""
-        return await commands.has_any_role(*MODERATION_ROLES, Roles.core_developers).predicate(ctx)
+        return await commands.has_any_role(*constants.MODERATION_ROLES, constants.Roles.core_developers).predicate(ctx)
 
     # This cannot be static (must have a __func__ attribute).
     async def cog_command_error(self, ctx: Context, error: Exception) -> None:
@@ -102,7 +102,7 @@ class Extensions(commands.Cog):
         if "*" in extensions or "**" in extensions:
             extensions = set(EXTENSIONS) - set(self.bot.extensions.keys())
 
-        msg = self.batch_manage(Action.LOAD, *extensions)
+        msg = await self.batch_manage(Action.LOAD, *extensions)
         await ctx.send(msg)
 
     @extensions_group.command(name="unload", aliases=("ul",))
@@ -124,7 +124,7 @@ class Extensions(commands.Cog):
             if "*" in extensions or "**" in extensions:
                 extensions = set(self.bot.extensions.keys()) - UNLOAD_BLACKLIST
 
-            msg = self.batch_manage(Action.UNLOAD, *extensions)
+            msg = await self.batch_manage(Action.UNLOAD, *extensions)
 
         await ctx.send(msg)
 
@@ -148,7 +148,7 @@ class Extensions(commands.Cog):
             extensions = set(self.bot.extensions.keys()) | set(extensions)
             extensions.remove("*")
 
-        msg = self.batch_manage(Action.RELOAD, *extensions)
+        msg = await self.batch_manage(Action.RELOAD, *extensions)
 
         await ctx.send(msg)
 
@@ -162,8 +162,8 @@ class Extensions(commands.Cog):
         """
         embed = Embed(
             title="Extensions List",
-            url=URLs.github_bot_repo,
-            colour=Colours.info
+            url=constants.URLs.github_bot_repo,
+            colour=constants.Colours.info
         )
 
         categories = self.group_extension_statuses()
@@ -183,9 +183,9 @@ class Extensions(commands.Cog):
 
         for ext in EXTENSIONS:
             if ext in self.bot.extensions:
-                status = Emojis.status_online
+                status = constants.Emojis.status_online
             else:
-                status = Emojis.status_offline
+                status = constants.Emojis.status_offline
 
             path = ext.split(".")
             if len(path) > BASE_PATH_LEN + 1:
@@ -197,15 +197,22 @@ class Extensions(commands.Cog):
 
         return categories
 
-    def batch_manage(self, action: Action, *extensions: str) -> str:
+    async def batch_manage(self, action: Action, *extensions: str) -> str:
         """
         Apply an action to multiple extensions and return a message with the results.
 
+        Extensions being loaded or reloaded are compiled in a worker thread first, so only executing them
+        blocks the event loop. How long the loop was blocked for is included in the message.
+
         If only one extension is given, it is deferred to `manage()`.
         """
+        if action is not Action.UNLOAD:
+            await self.bot.precompile_extensions(extensions)
+
+        start = time.perf_counter()
         if len(extensions) == 1:
             msg, _ = self.manage(action, extensions[0])
-            return msg
+            return f"{msg}\n{self._blocked_message(start)}"
 
         verb = action.name.lower()
         failures = {}
@@ -217,6 +224,7 @@ class Extensions(commands.Cog):
 
         emoji = ":x:" if failures else ":ok_hand:"
         msg = f"{emoji} {len(extensions) - len(failures)} / {len(extensions)} extensions {verb}ed."
+        msg += f"\n{self._blocked_message(start)}"
 
         if failures:
             failures = "\n".join(f"{ext}\n    {err}" for ext, err in failures.items())
@@ -226,6 +234,11 @@ class Extensions(commands.Cog):
 
         return msg
 
+    @staticmethod
+    def _blocked_message(start: float) -> str:
+        """Return a message saying how long the event loop was blocked for since `start`."""
+        return f":stopwatch: Blocked the event loop for {(time.perf_counter() - start) * 1000:.0f}ms."
+
     def manage(self, action: Action, ext: str) -> t.Tuple[str, t.Optional[str]]:
         """Apply an action to an extension and return the status message and any error message."""
         verb = action.name.lower()
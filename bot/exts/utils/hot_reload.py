@@ -0,0 +1,181 @@
+import ast
+import asyncio
+import importlib.util
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+from types import ModuleType
+
+from discord.ext.commands import Cog
+
+from bot import constants, exts, logger
+from bot.bot import ThreadBot
+
+# How often to check for changes, and how long changes have to stop for before reloading, in seconds.
+POLL_INTERVAL = 1.0
+DEBOUNCE_DELAY = 0.5
+
+EXTS_PATH = Path(exts.__path__[0])
+
+
+def snapshot_modules() -> dict[str, int]:
+    """Return the modification time of every module under bot.exts, keyed by path."""
+    mtimes = {}
+    for directory, _, files in os.walk(EXTS_PATH):
+        for file in files:
+            if file.endswith(".py"):
+                path = os.path.join(directory, file)
+                mtimes[path] = os.stat(path).st_mtime_ns
+    return mtimes
+
+
+def module_name(path: str) -> str:
+    """Return the qualified name of the module at `path`, which must be under bot.exts."""
+    parts = Path(path).relative_to(EXTS_PATH).with_suffix("").parts
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join((exts.__name__, *parts))
+
+
+def referenced_modules(module: ModuleType) -> set[str]:
+    """Return the names of the modules `module` imported, or imported classes and functions from."""
+    names = set()
+    for value in vars(module).values():
+        if isinstance(value, ModuleType):
+            # A package has its submodules as attributes, but doesn't depend on them.
+            if not value.__name__.startswith(f"{module.__name__}."):
+                names.add(value.__name__)
+        elif isinstance(getattr(value, "__module__", None), str):
+            names.add(value.__module__)
+    return names
+
+
+def imported_modules(module: ModuleType) -> set[str]:
+    """
+    Return the names of the modules `module` imports, or imports names from, according to its source.
+
+    Unlike `referenced_modules`, this also finds modules only constants, such as strings, are imported from.
+    """
+    path = getattr(module, "__file__", None)
+    if not path or not path.endswith(".py"):
+        return set()
+    try:
+        tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    except (OSError, SyntaxError, ValueError):
+        return set()
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            try:
+                base = importlib.util.resolve_name("." * node.level + (node.module or ""), module.__package__)
+            except (ImportError, ValueError):
+                continue
+            names.add(base)
+            # Names imported from a package may be its submodules.
+            names.update(f"{base}.{alias.name}" for alias in node.names)
+    return names
+
+
+def affected_modules(modules: set[str]) -> set[str]:
+    """Return `modules` and the loaded modules under bot.exts which import from them, directly or indirectly."""
+    importers = defaultdict(set)
+    for name, module in tuple(sys.modules.items()):
+        if module is None or not name.startswith(f"{exts.__name__}."):
+            continue
+        for dependency in referenced_modules(module) | imported_modules(module):
+            importers[dependency].add(name)
+
+    affected = set(modules)
+    pending = list(modules)
+    while pending:
+        for importer in importers[pending.pop()] - affected:
+            affected.add(importer)
+            pending.append(importer)
+    return affected
+
+
+class HotReload(Cog):
+    """Reloads extensions when their files change, for development."""
+
+    def __init__(self, bot: ThreadBot):
+        self.bot = bot
+        self.watch_task = self.bot.loop.create_task(self.watch())
+
+    def cog_unload(self) -> None:
+        """Stop watching for changes."""
+        self.watch_task.cancel()
+
+    async def watch(self) -> None:
+        """Poll the extension files for changes, and reload the affected extensions once changes stop."""
+        await self.bot.wait_until_guild_available()
+
+        previous = await asyncio.to_thread(snapshot_modules)
+        changed = set()
+        while True:
+            await asyncio.sleep(DEBOUNCE_DELAY if changed else POLL_INTERVAL)
+
+            current = await asyncio.to_thread(snapshot_modules)
+            new_changes = {path for path in current.keys() | previous.keys() if current.get(path) != previous.get(path)}
+            previous = current
+
+            if new_changes:
+                changed |= new_changes
+            elif changed:
+                try:
+                    await self.reload_changed(changed)
+                except Exception:
+                    logger.exception("Hot reload failed.")
+                changed = set()
+
+    def dependent_extensions(self, modules: set[str]) -> list[str]:
+        """Return the loaded extensions which are, or contain, any of `modules`."""
+        return [
+            name for name in self.bot.extensions
+            if any(module == name or module.startswith(f"{name}.") for module in modules)
+        ]
+
+    async def reload_changed(self, paths: set[str]) -> None:
+        """Reload the loaded extensions that depend on the modules at `paths`, and log a summary."""
+        modules = {module_name(path) for path in paths}
+        affected = affected_modules(modules)
+        dependents = self.dependent_extensions(affected)
+
+        if __name__ in dependents:
+            # Reloading this extension would cancel the task doing the reloading.
+            dependents.remove(__name__)
+            logger.info(f"{__name__} changed, reload it manually to apply the changes.")
+
+        if not dependents:
+            logger.debug(f"No loaded extensions depend on the changed modules: {', '.join(sorted(modules))}")
+            return
+
+        extensions_cog = self.bot.get_cog("Extensions")
+        if not extensions_cog:
+            logger.warning("Cannot hot reload extensions, as the Extensions cog isn't loaded.")
+            return
+
+        # Drop changed helper modules, and the helpers importing from them, so the extensions importing them
+        # import the new versions. Packages are kept, as dropping them would orphan their other submodules.
+        for module in affected:
+            if module not in self.bot.extensions and not hasattr(sys.modules.get(module), "__path__"):
+                sys.modules.pop(module, None)
+
+        # Looked up through the cog, as the extensions module may have been reloaded since this one was imported.
+        action = sys.modules[type(extensions_cog).__module__].Action.RELOAD
+        result = await extensions_cog.batch_manage(action, *dependents)
+
+        changed_modules = "\n".join(f"`{module}`" for module in sorted(modules))
+        logger.info(f"Hot reloaded {', '.join(dependents)}.")
+        await self.bot.send_log("Hot reload", f"Changed:\n{changed_modules}\n\n{result}")
+
+
+def setup(bot: ThreadBot) -> None:
+    """Load the HotReload cog when in debug mode."""
+    if not constants.DEBUG_MODE:
+        logger.info("Not watching extensions for changes, as debug mode is off.")
+        return
+    bot.add_cog(HotReload(bot))
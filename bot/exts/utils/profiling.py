@@ -0,0 +1,70 @@
+from discord import Embed
+from discord.ext import commands
+from discord.ext.commands import Context, group
+
+from bot import constants
+from bot.bot import ThreadBot
+
+SORT_KEYS = ("total", "peak", "mean", "calls")
+# Keeps the table within the embed description's character limit.
+MAX_LISTENERS = 30
+
+
+class Profiling(commands.Cog):
+    """Commands to inspect how the bot spends its time."""
+
+    def __init__(self, bot: ThreadBot):
+        self.bot = bot
+
+    # This cannot be static (must have a __func__ attribute).
+    async def cog_check(self, ctx: Context) -> bool:
+        """Only allow staff to invoke the commands in this cog."""
+        return await commands.has_any_role(*constants.STAFF_ROLES).predicate(ctx)
+
+    @group(name="dispatchstats", aliases=("dispatch", "hot"), invoke_without_command=True)
+    async def dispatch_stats_group(self, ctx: Context, count: int = 10, sort: str = "total") -> None:
+        """
+        Show the `count` event listeners that took the most time, sorted by `sort`.
+
+        `sort` can be one of total, peak, mean, or calls.
+        """
+        profiler = self.bot.dispatch_profiler
+        if not profiler:
+            await ctx.send(":x: Dispatch profiling is disabled, set `bot.stats.profile_dispatch` to enable it.")
+            return
+
+        if sort not in SORT_KEYS:
+            raise commands.BadArgument(f"Can only sort by one of {', '.join(SORT_KEYS)}.")
+
+        handlers = profiler.top(min(count, MAX_LISTENERS), sort)
+        if not handlers:
+            await ctx.send("No events have been handled yet.")
+            return
+
+        lines = [f"{'listener':<40} {'event':<24} {'calls':>7} {'total':>9} {'mean':>8} {'peak':>8}"]
+        for handler in handlers:
+            lines.append(
+                f"{handler.listener[:40]:<40} {handler.event[:24]:<24} {handler.calls:>7} "
+                f"{handler.total:>8.2f}s {handler.mean * 1000:>6.1f}ms {handler.peak * 1000:>6.1f}ms"
+            )
+
+        embed = Embed(
+            title=f"Top {len(handlers)} listeners by {sort}",
+            colour=constants.Colours.info,
+            description="```\n" + "\n".join(lines) + "```"
+        )
+        busiest = ", ".join(f"{event} ({dispatches})" for event, dispatches in profiler.dispatches.most_common(5))
+        embed.set_footer(text=f"Most dispatched events: {busiest}")
+        await ctx.send(embed=embed)
+
+    @dispatch_stats_group.command(name="reset")
+    async def reset_command(self, ctx: Context) -> None:
+        """Forget all recorded dispatch times."""
+        if self.bot.dispatch_profiler:
+            self.bot.dispatch_profiler.reset()
+        await ctx.send(":ok_hand: Dispatch stats reset.")
+
+
+def setup(bot: ThreadBot) -> None:
+    """Load the Profiling cog."""
+    bot.add_cog(Profiling(bot))
@@ -5,8 +5,8 @@ from typing import Optional, Tuple, Union
 from discord import Embed, utils
 from discord.ext import commands
 
+from bot import constants
 from bot.bot import ThreadBot, logger
-from bot.constants import URLs
 
 SourceType = Union[commands.HelpCommand, commands.Command, commands.Cog, str]
 
@@ -46,7 +46,7 @@ class BotSource(commands.Cog):
         """Display information and a GitHub link to the source code of a command, tag, or cog."""
         if not source_item:
             embed = Embed(title="Sir Threadevere's GitHub Repository")
-            embed.add_field(name="Repository", value=f"[Go to GitHub]({URLs.github_bot_repo})")
+            embed.add_field(name="Repository", value=f"[Go to GitHub]({constants.URLs.github_bot_repo})")
             embed.set_thumbnail(url="https://avatars1.githubusercontent.com/u/9919")
             await ctx.send(embed=embed)
             return
@@ -91,7 +91,7 @@ class BotSource(commands.Cog):
         else:
             file_location = Path(filename).relative_to(Path.cwd()).as_posix()
 
-        url = f"{URLs.github_bot_repo}/blob/main/{file_location}{lines_extension}"
+        url = f"{constants.URLs.github_bot_repo}/blob/main/{file_location}{lines_extension}"
 
         return url, file_location, first_line_no or None
 
@@ -0,0 +1,133 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional, TYPE_CHECKING
+
+from bot import logger
+
+if TYPE_CHECKING:
+    from bot.bot import ThreadBot
+
+# Embed descriptions are limited to 4096 characters, leave room for the rest of the message.
+MAX_STACK_LENGTH = 3500
+
+
+class LagMonitor:
+    """
+    Measures how late the event loop runs a callback scheduled every `interval` seconds.
+
+    The lag percentiles over each `report_interval` are sent to statsd as `loop.lag.*` gauges, in milliseconds.
+
+    A watchdog thread notices when the loop hasn't run the monitor for longer than `threshold` seconds past when it
+    should have, and captures the stack of the code blocking the loop. Once the loop recovers, a warning with that
+    stack is sent to the dev log, at most once every `alert_cooldown` seconds.
+    """
+
+    def __init__(
+        self,
+        bot: "ThreadBot",
+        *,
+        interval: float,
+        threshold: float,
+        report_interval: float,
+        alert_cooldown: float
+    ):
+        self.bot = bot
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        self.alert_cooldown = alert_cooldown
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+
+        # Only written by the loop thread, and read by the watchdog thread.
+        self._heartbeat = time.monotonic()
+        # Only written by the watchdog thread until the loop thread reports and clears it.
+        self._blocked_stack: Optional[str] = None
+        self._last_alert = 0.0
+
+    def start(self) -> None:
+        """Start monitoring the loop, if it isn't being monitored already."""
+        if self._task and not self._task.done():
+            return
+
+        self._stopped.clear()
+        self._task = self.bot.loop.create_task(self._monitor())
+
+    def stop(self) -> None:
+        """Stop monitoring the loop."""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _monitor(self) -> None:
+        """Measure the loop's lag every `interval` seconds and report it."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._watchdog = threading.Thread(target=self._watch, name="lag-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+        samples = deque()
+        loop = asyncio.get_running_loop()
+        next_report = loop.time() + self.report_interval
+
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            self._heartbeat = time.monotonic()
+
+            lag = max(now - expected, 0)
+            samples.append(lag)
+
+            if lag > self.threshold:
+                self._alert(lag)
+
+            if now >= next_report:
+                self._report(sorted(samples))
+                samples.clear()
+                next_report = now + self.report_interval
+
+    def _report(self, samples: list[float]) -> None:
+        """Send percentiles of the sorted lag `samples` to statsd."""
+        if not samples:
+            return
+
+        for name, percentile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = samples[min(int(len(samples) * percentile), len(samples) - 1)]
+            self.bot.stats.gauge(f"loop.lag.{name}", round(value * 1000, 3))
+        self.bot.stats.gauge("loop.lag.max", round(samples[-1] * 1000, 3))
+
+    def _alert(self, lag: float) -> None:
+        """Log a warning about the loop being blocked for `lag` seconds, and send it to the dev log."""
+        stack, self._blocked_stack = self._blocked_stack, None
+        self.bot.stats.incr("loop.blocked")
+        logger.warning(f"Event loop was blocked for {lag:.3f}s.\n{stack or ''}")
+
+        if time.monotonic() - self._last_alert < self.alert_cooldown:
+            return
+        self._last_alert = time.monotonic()
+
+        details = f"The event loop was blocked for **{lag * 1000:.0f}ms**."
+        if stack:
+            details += f"\n```py\n{stack[-MAX_STACK_LENGTH:]}```"
+        else:
+            details += "\nThe blocking code was not captured."
+        self.bot.loop.create_task(self.bot.send_log("Event loop lag", details))
+
+    def _watch(self) -> None:
+        """Capture the stack of the loop thread while the loop is blocked. Runs in the watchdog thread."""
+        while not self._stopped.wait(self.threshold / 2):
+            blocked_for = time.monotonic() - self._heartbeat - self.interval
+            if blocked_for <= self.threshold or self._blocked_stack is not None:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._blocked_stack = "".join(traceback.format_stack(frame))
@@ -0,0 +1,165 @@
+import itertools
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional
+
+import discord
+from discord.state import ConnectionState
+
+from bot import constants, logger
+
+
+def configured_channels() -> frozenset[int]:
+    """Return the ids of the channels named in `bot.message_cache.channels`, whose messages are cached."""
+    channel_ids = set()
+    for name in constants.MessageCache.channels:
+        channel_id = getattr(constants.Channels, name, None)
+        if channel_id is None:
+            logger.error(f'Channel "{name}" of the message cache is not in the guild.channels configuration.')
+            continue
+        channel_ids.add(channel_id)
+    return frozenset(channel_ids)
+
+
+class ChannelMessageCache:
+    """
+    A message cache keeping the last `maxlen` messages posted in `channels` or in their threads.
+
+    Messages from other channels are dropped as they are appended, so they don't take memory or slow down
+    lookups. It implements the parts of the deque protocol discord.py uses for its message cache, while
+    finding messages by id and thread starter messages by the id of the message they reference in O(1).
+    """
+
+    def __init__(self, maxlen: int, channels: Iterable[int]):
+        self.maxlen = maxlen
+        self.channels = frozenset(channels)
+        self._messages: OrderedDict[int, discord.Message] = OrderedDict()
+        # Maps the ids of the messages threads were started from to the thread_starter_message in the thread.
+        self._starters: dict[int, discord.Message] = {}
+
+    def accepts(self, message: discord.Message) -> bool:
+        """Return whether `message` was posted in one of the cached channels or in one of their threads."""
+        channel = message.channel
+        return channel.id in self.channels or getattr(channel, "parent_id", None) in self.channels
+
+    def append(self, message: discord.Message) -> None:
+        """Cache `message` if it belongs to one of the cached channels, evicting the oldest message when full."""
+        if not self.accepts(message):
+            return
+
+        if (previous := self._messages.pop(message.id, None)) is not None:
+            self._unindex(previous)
+
+        self._messages[message.id] = message
+        self._index(message)
+
+        while len(self._messages) > self.maxlen:
+            _, evicted = self._messages.popitem(last=False)
+            self._unindex(evicted)
+
+    def extend(self, messages: Iterable[discord.Message]) -> None:
+        """Cache each message of `messages`, oldest first."""
+        for message in messages:
+            self.append(message)
+
+    def remove(self, message: discord.Message) -> None:
+        """Remove `message` from the cache, raising a ValueError if it isn't cached."""
+        if message not in self:
+            raise ValueError(f"message {message.id} is not in the message cache")
+        self._unindex(self._messages.pop(message.id))
+
+    def clear(self) -> None:
+        """Remove every message from the cache."""
+        self._messages.clear()
+        self._starters.clear()
+
+    def get(self, message_id: int) -> Optional[discord.Message]:
+        """Return the cached message with `message_id`, if there is one."""
+        return self._messages.get(message_id)
+
+    def get_thread_starter(self, message_id: int) -> Optional[discord.Message]:
+        """Return the cached thread_starter_message of the thread started from the message with `message_id`."""
+        return self._starters.get(message_id)
+
+    def _index(self, message: discord.Message) -> None:
+        """Index `message` by the message it references, if it's a thread_starter_message."""
+        if message.type is discord.MessageType.thread_starter_message and message.reference:
+            self._starters[message.reference.message_id] = message
+
+    def _unindex(self, message: discord.Message) -> None:
+        """Remove `message` from the index of thread starter messages, if it's in there."""
+        reference = message.reference
+        if reference and self._starters.get(reference.message_id) is message:
+            del self._starters[reference.message_id]
+
+    def index(self, message: discord.Message) -> int:
+        """Return the position of `message` in the cache, oldest first, raising a ValueError if it isn't cached."""
+        if message in self:
+            for position, cached in enumerate(self._messages.values()):
+                if cached == message:
+                    return position
+        raise ValueError(f"message {message.id} is not in the message cache")
+
+    def count(self, message: discord.Message) -> int:
+        """Return how many times `message` is cached, which is at most once."""
+        return int(message in self)
+
+    def __contains__(self, message: object) -> bool:
+        cached = self._messages.get(getattr(message, "id", None))
+        return cached is not None and cached == message
+
+    def __getitem__(self, position: int) -> discord.Message:
+        if position < 0:
+            position += len(self._messages)
+        if not 0 <= position < len(self._messages):
+            raise IndexError("message cache index out of range")
+        return next(itertools.islice(self._messages.values(), position, None))
+
+    def __iter__(self) -> Iterator[discord.Message]:
+        return iter(self._messages.values())
+
+    def __reversed__(self) -> Iterator[discord.Message]:
+        return reversed(self._messages.values())
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __repr__(self) -> str:
+        return f"<ChannelMessageCache len={len(self._messages)} maxlen={self.maxlen} channels={len(self.channels)}>"
+
+
+class ThreadConnectionState(ConnectionState):
+    """A connection state caching messages in a `ChannelMessageCache` rather than in a deque of every message."""
+
+    def __init__(self, *, cached_channels: Iterable[int], **options):
+        # Set before initialising the state, which clears it and so creates the message cache.
+        self.cached_channels = frozenset(cached_channels)
+        self._message_cache: Optional[ChannelMessageCache] = None
+        super().__init__(**options)
+
+    @property
+    def _messages(self) -> Optional[ChannelMessageCache]:
+        """The message cache, or None if messages aren't cached."""
+        return self._message_cache
+
+    @_messages.setter
+    def _messages(self, messages: Optional[Iterable[discord.Message]]) -> None:
+        # discord.py assigns a new deque when the state is cleared and when a guild is removed, so wrap whatever
+        # is assigned to keep a channel-filtered cache.
+        if messages is None:
+            self._message_cache = None
+            return
+
+        cache = ChannelMessageCache(self.max_messages, self.cached_channels)
+        cache.extend(messages)
+        self._message_cache = cache
+
+    def configure_message_cache(self, max_messages: int, cached_channels: Iterable[int]) -> None:
+        """Change the size and channels of the message cache, keeping the cached messages which still fit."""
+        self.max_messages = max_messages
+        self.cached_channels = frozenset(cached_channels)
+        if self._message_cache is not None:
+            self._messages = list(self._message_cache)
+
+    def _get_message(self, msg_id: Optional[int]) -> Optional[discord.Message]:
+        """Return the cached message with `msg_id`, without scanning the cache as discord.py does."""
+        return self._message_cache.get(msg_id) if self._message_cache is not None else None
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import random
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from bot import logger
+from bot.database import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    action          TEXT NOT NULL,
+    key             INTEGER NOT NULL,
+    payload         TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at      REAL NOT NULL,
+    completed_at    REAL,
+    failed_at       REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS outbox_pending ON outbox (action, key)
+    WHERE completed_at IS NULL AND failed_at IS NULL;
+"""
+
+# Entries are given up on after failing this many times.
+MAX_ATTEMPTS = 10
+# Delay before retrying an entry after its first failure, doubled after every failure up to the maximum, in seconds.
+BASE_RETRY_DELAY = 5
+MAX_RETRY_DELAY = 15 * 60
+# Amount of entries processed between checks for new entries.
+BATCH_SIZE = 50
+# Finished entries are deleted after this many seconds.
+RETENTION = 7 * 24 * 60 * 60
+
+Handler = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+def retry_delay(failures: int) -> float:
+    """Return how long to wait before trying again after `failures` consecutive failures, with some jitter."""
+    return min(BASE_RETRY_DELAY * 2 ** (failures - 1), MAX_RETRY_DELAY) * random.uniform(0.8, 1.2)
+
+
+class Outbox:
+    """
+    A durable queue of actions, such as API calls, which must eventually be done even if they fail or the bot restarts.
+
+    Entries are appended to a SQLite table before anything is done, and a single worker runs the handler registered
+    for their action, oldest entry first. If a handler raises, the entry is retried with exponential backoff, and
+    given up on after `MAX_ATTEMPTS` attempts. Entries left pending when the bot stops are picked up by the worker
+    once it's started again.
+
+    Handlers may run more than once for the same entry, if the bot stops before their completion is recorded,
+    so they must check whether their action was already done. An action and key can only be pending once;
+    appending them again before they're done has no effect.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, db: Database):
+        self.loop = loop
+        self.db = db
+
+        self._handlers: dict[str, Handler] = {}
+        self._tables: Optional[asyncio.Task] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    async def _create_tables(self) -> None:
+        """Create the outbox table if it doesn't exist yet, once, and forget entries finished long ago."""
+        if self._tables is None or (self._tables.done() and self._tables.exception()):
+            self._tables = self.loop.create_task(self.db.executescript(SCHEMA))
+            cutoff = time.time() - RETENTION
+            self.db.write("DELETE FROM outbox WHERE completed_at < ? OR failed_at < ?", (cutoff, cutoff))
+        await asyncio.shield(self._tables)
+
+    def register(self, action: str, handler: Handler) -> None:
+        """Run `handler` with the payload of the entries for `action`, replacing the previous handler."""
+        self._handlers[action] = handler
+        self._wake.set()
+
+    def unregister(self, action: str) -> None:
+        """Stop running entries for `action`. They stay pending until a handler is registered again."""
+        self._handlers.pop(action, None)
+
+    async def append(self, action: str, key: int, payload: dict[str, Any]) -> None:
+        """Record that `action` must be done for `key` with `payload`, returning once it's committed to disk."""
+        await self._create_tables()
+        now = time.time()
+        await self.db.write(
+            "INSERT OR IGNORE INTO outbox (action, key, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (action, key, json.dumps(payload), now, now)
+        )
+        self._wake.set()
+
+    def start(self) -> None:
+        """Start processing pending entries, including those left over from a previous run."""
+        if self._worker is None or self._worker.done():
+            self._worker = self.loop.create_task(self._work())
+
+    def stop(self) -> None:
+        """Stop processing entries. Pending entries are kept for the next start."""
+        if self._worker:
+            self._worker.cancel()
+
+    async def _work(self) -> None:
+        """Process due entries, and sleep until the next one is due or a new one is appended."""
+        failures = 0
+        while True:
+            try:
+                await self._create_tables()
+                timeout = await self._process_due()
+            except Exception:
+                # Reading the entries failed, such as when the database is locked; the worker must keep going,
+                # as it's the only way pending entries get done.
+                failures += 1
+                delay = retry_delay(failures)
+                logger.exception(f"The outbox worker failed to read its entries, retrying in {delay:.0f}s.")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+
+            if timeout == 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process_due(self) -> Optional[float]:
+        """Process a batch of due entries, and return how long until the next one is due, or None if none is."""
+        self._wake.clear()
+        actions = tuple(self._handlers)
+        placeholders = ", ".join("?" * len(actions))
+        pending = f"completed_at IS NULL AND failed_at IS NULL AND action IN ({placeholders})"
+
+        entries = await self.db.fetchall(
+            f"SELECT * FROM outbox WHERE {pending} AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+            (*actions, time.time(), BATCH_SIZE)
+        )
+        writes = []
+        for entry in entries:
+            if write := await self._process(entry):
+                writes.append(write)
+        # Outcomes only need to be committed before the entries are read again.
+        await asyncio.gather(*writes, return_exceptions=True)
+        if len(entries) == BATCH_SIZE:
+            return 0
+
+        row = await self.db.fetchone(f"SELECT MIN(next_attempt_at) FROM outbox WHERE {pending}", actions)
+        return None if row[0] is None else max(row[0] - time.time(), 0)
+
+    async def _process(self, entry: sqlite3.Row) -> Optional[asyncio.Future]:
+        """Run the handler of `entry`, and return the future of the write recording the outcome, if any."""
+        action, key = entry["action"], entry["key"]
+        if (handler := self._handlers.get(action)) is None:
+            return None  # Unregistered while the batch was running, it's picked up once registered again.
+
+        try:
+            await handler(json.loads(entry["payload"]))
+        except Exception as e:
+            attempts = entry["attempts"] + 1
+            if attempts >= MAX_ATTEMPTS:
+                logger.exception(f"Giving up on outbox entry {action} {key} after {attempts} attempts.")
+                return self.db.write(
+                    "UPDATE outbox SET attempts = ?, failed_at = ? WHERE id = ?",
+                    (attempts, time.time(), entry["id"])
+                )
+
+            delay = retry_delay(attempts)
+            logger.warning(f"Outbox entry {action} {key} failed, retrying in {delay:.0f}s: {e!r}")
+            return self.db.write(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ? WHERE id = ?",
+                (attempts, time.time() + delay, entry["id"])
+            )
+
+        return self.db.write("UPDATE outbox SET completed_at = ? WHERE id = ?", (time.time(), entry["id"]))
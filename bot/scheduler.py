@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from bot import logger
+from bot.database import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduled_actions (
+    action  TEXT NOT NULL,
+    key     INTEGER NOT NULL,
+    due_at  REAL NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (action, key)
+);
+"""
+
+# Actions due within this many seconds of the earliest one are run in the same wake-up.
+BATCH_WINDOW = 1.0
+
+Handler = Callable[[dict[str, Any]], Awaitable[None]]
+# An action's name and key, which identify it.
+ActionKey = tuple[str, int]
+
+
+class Scheduler:
+    """
+    Runs actions, such as archiving a thread, at a given time, including after the bot restarts.
+
+    Actions are identified by their name and a key, and scheduling an action again replaces it. They are kept
+    in a SQLite table, which is loaded into a min-heap of deadlines on start. A single timer is armed for the
+    earliest deadline; when it fires, every action due by then is run in one batch by the handler registered for
+    its name. Actions whose handler isn't registered wait until it is.
+
+    Actions are removed once their handler ran, whether it succeeded or not, so handlers that need to retry
+    should hand their work to something which does, such as the outbox.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, db: Database):
+        self.loop = loop
+        self.db = db
+
+        self._handlers: dict[str, Handler] = {}
+        # The scheduled actions, the heap may also hold outdated deadlines of replaced or cancelled ones.
+        self._actions: dict[ActionKey, tuple[float, dict[str, Any]]] = {}
+        self._heap: list[tuple[float, int, ActionKey]] = []
+        # Breaks ties between equal deadlines, so keys are never compared.
+        self._counter = itertools.count()
+        # Due actions whose handler isn't registered, by name.
+        self._waiting: dict[str, list[int]] = {}
+        # Actions cancelled before the persisted ones were loaded, whose rows may not be deleted yet when loading.
+        self._cancelled: Optional[set[ActionKey]] = set()
+
+        self._tables = self.loop.create_task(self.db.executescript(SCHEMA))
+        self._started = False
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at: Optional[float] = None
+        self._runs: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Load the actions scheduled before the bot restarted, and start running actions when they are due."""
+        if self._started:
+            return
+        self._started = True
+
+        await self._tables
+        rows = await self.db.fetchall("SELECT * FROM scheduled_actions")
+        cancelled, self._cancelled = self._cancelled or set(), None
+        for action, key, due_at, payload in rows:
+            # Skip actions scheduled again or cancelled since the bot started.
+            if (action, key) not in self._actions and (action, key) not in cancelled:
+                self._push(action, key, due_at, json.loads(payload))
+        logger.info(f"Loaded {len(self._actions)} scheduled actions.")
+        self._arm()
+
+    def stop(self) -> None:
+        """Stop running actions. They are kept, and loaded again on the next start."""
+        self._started = False
+        self._cancelled = set()
+        if self._timer:
+            self._timer.cancel()
+            self._timer = self._timer_at = None
+        for task in self._runs:
+            task.cancel()
+
+    def register(self, action: str, handler: Handler) -> None:
+        """Run `handler` with the payload of the `action` actions when they are due, replacing the previous one."""
+        self._handlers[action] = handler
+        for key in self._waiting.pop(action, ()):
+            if (action, key) in self._actions:
+                due_at, _ = self._actions[action, key]
+                heapq.heappush(self._heap, (due_at, next(self._counter), (action, key)))
+        self._arm()
+
+    def unregister(self, action: str) -> None:
+        """Stop running the `action` actions. They wait until a handler is registered again."""
+        self._handlers.pop(action, None)
+
+    def schedule(self, action: str, key: int, due_at: float, payload: dict[str, Any]) -> None:
+        """Run `action` for `key` with `payload` at the UNIX timestamp `due_at`, replacing any existing one."""
+        if self._cancelled is not None:
+            self._cancelled.discard((action, key))
+        self.db.write(
+            "INSERT OR REPLACE INTO scheduled_actions (action, key, due_at, payload) VALUES (?, ?, ?, ?)",
+            (action, key, due_at, json.dumps(payload))
+        )
+        self._push(action, key, due_at, payload)
+        self._arm()
+
+    def cancel(self, action: str, key: int) -> bool:
+        """
+        Cancel `action` for `key`, returning whether it was scheduled.
+
+        Before `start` loads the actions scheduled before the bot restarted, those are cancelled too,
+        but only actions scheduled since then count as removed.
+        """
+        self.db.write("DELETE FROM scheduled_actions WHERE action = ? AND key = ?", (action, key))
+        if self._cancelled is not None:
+            self._cancelled.add((action, key))
+        return self._actions.pop((action, key), None) is not None
+
+    def get(self, action: str, key: int) -> Optional[float]:
+        """Return when `action` for `key` is due, or None if it isn't scheduled."""
+        if scheduled := self._actions.get((action, key)):
+            return scheduled[0]
+        return None
+
+    def _push(self, action: str, key: int, due_at: float, payload: dict[str, Any]) -> None:
+        """Add the action to the heap, leaving any previous deadline of it to be skipped when popped."""
+        self._actions[action, key] = (due_at, payload)
+        heapq.heappush(self._heap, (due_at, next(self._counter), (action, key)))
+
+    def _arm(self) -> None:
+        """Set the timer for the earliest deadline, if it isn't set for it already."""
+        if not self._started:
+            return
+
+        # Drop outdated deadlines, so the timer isn't set for an action which was cancelled or rescheduled.
+        while self._heap:
+            due_at, _, action_key = self._heap[0]
+            if self._actions.get(action_key, (None,))[0] == due_at:
+                break
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            return
+        due_at = self._heap[0][0]
+        if self._timer_at is not None and self._timer_at <= due_at:
+            return
+
+        if self._timer:
+            self._timer.cancel()
+        self._timer_at = due_at
+        self._timer = self.loop.call_later(max(due_at - time.time(), 0), self._wake)
+
+    def _wake(self) -> None:
+        """Pop every action due by now, and run them all in a single task."""
+        self._timer = self._timer_at = None
+
+        batch = []
+        deadline = time.time() + BATCH_WINDOW
+        while self._heap and self._heap[0][0] <= deadline:
+            due_at, _, action_key = heapq.heappop(self._heap)
+            if self._actions.get(action_key, (None,))[0] != due_at:
+                continue  # Cancelled or rescheduled.
+
+            action, key = action_key
+            if action not in self._handlers:
+                self._waiting.setdefault(action, []).append(key)
+                continue
+            _, payload = self._actions.pop(action_key)
+            batch.append((action_key, self._handlers[action], payload))
+
+        if batch:
+            task = self.loop.create_task(self._run(batch))
+            self._runs.add(task)
+            task.add_done_callback(self._runs.discard)
+        self._arm()
+
+    async def _run(self, batch: list[tuple[ActionKey, Handler, dict[str, Any]]]) -> None:
+        """Run the handlers of the due actions in `batch` concurrently, then forget the actions."""
+        results = await asyncio.gather(*(handler(payload) for _, handler, payload in batch), return_exceptions=True)
+
+        for ((action, key), _, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.opt(exception=result).error(f"Scheduled action {action} {key} failed.")
+            if (action, key) not in self._actions:  # Not scheduled again while it was running.
+                self.db.write("DELETE FROM scheduled_actions WHERE action = ? AND key = ?", (action, key))
@@ -1,9 +1,25 @@
+import ast
+import hashlib
 import importlib
+import importlib.machinery
+import importlib.util
 import inspect
+import json
+import os
 import pkgutil
-from typing import Iterator, NoReturn
+import time
+from pathlib import Path
+from types import CodeType, ModuleType
+from typing import Iterator, NoReturn, Optional
 
-from bot import exts
+from bot import exts, logger
+
+# Caches the result of `walk_extensions`, along with a fingerprint of the files it was computed from.
+MANIFEST_PATH = Path(".cache", "extensions.json")
+MANIFEST_VERSION = 2
+
+# Decorators that register a top-level command, as `commands.<name>(...)` or `<name>(...)`.
+COMMAND_DECORATORS = {"command", "group"}
 
 
 def unqualify(name: str) -> str:
@@ -11,6 +27,47 @@ def unqualify(name: str) -> str:
     return name.rsplit(".", maxsplit=1)[-1]
 
 
+class ExtensionLoader(importlib.machinery.SourceFileLoader):
+    """
+    A source file loader that records how long executing the module took, in seconds.
+
+    If `code` is given, it's executed instead of reading and compiling the source file.
+    """
+
+    exec_time: float = 0.0
+
+    def __init__(self, fullname: str, path: str, code: Optional[CodeType] = None):
+        super().__init__(fullname, path)
+        self.code = code
+
+    def get_code(self, fullname: str) -> CodeType:
+        """Return the precompiled code object if there is one, otherwise read or compile it as usual."""
+        if self.code is not None:
+            return self.code
+        return super().get_code(fullname)
+
+    def exec_module(self, module: ModuleType) -> None:
+        """Execute the module, timing it."""
+        start = time.perf_counter()
+        try:
+            super().exec_module(module)
+        finally:
+            self.exec_time = time.perf_counter() - start
+
+
+def compile_module(path: str) -> tuple[CodeType, int]:
+    """
+    Read and compile the module at `path`, returning the code object and the file's modification time.
+
+    This is safe to call from a worker thread, so the event loop doesn't have to do it.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, "rb") as f:
+        source = f.read()
+    # Same arguments the import system compiles modules with.
+    return compile(source, path, "exec", dont_inherit=True), mtime
+
+
 def walk_extensions() -> Iterator[str]:
     """Yield extension names from the bot.exts subpackage."""
 
@@ -31,4 +88,116 @@ def walk_extensions() -> Iterator[str]:
         yield module.name
 
 
-EXTENSIONS = frozenset(walk_extensions())
+def fingerprint_extensions() -> str:
+    """Return a hash of the path, size and modification time of every module under bot.exts."""
+    digest = hashlib.sha1()
+    for path in exts.__path__:
+        for directory, _, files in sorted(os.walk(path)):
+            for file in sorted(files):
+                if not file.endswith(".py"):
+                    continue
+                stat = os.stat(os.path.join(directory, file))
+                relative_path = os.path.relpath(os.path.join(directory, file), path)
+                digest.update(f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def read_manifest(fingerprint: str) -> Optional[dict]:
+    """Return the cached manifest if it was built from the files with the given `fingerprint`."""
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_text(encoding="UTF-8"))
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("fingerprint") != fingerprint:
+        return None
+    return manifest
+
+
+def write_manifest(manifest: dict) -> None:
+    """Save `manifest`, replacing the previous one atomically so a partially written file is never read."""
+    try:
+        MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = MANIFEST_PATH.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(manifest, indent=2), encoding="UTF-8")
+        temporary_path.replace(MANIFEST_PATH)
+    except OSError as e:
+        logger.warning(f"Failed to write the extension manifest to {MANIFEST_PATH}: {e}")
+
+
+def _constant_strings(node: Optional[ast.expr]) -> list[str]:
+    """Return the string constants in `node`, whether it's a single string or a tuple or list of them."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return [element.value for element in node.elts if isinstance(element, ast.Constant)]
+    return []
+
+
+def scan_entry_points(name: str) -> dict[str, list]:
+    """
+    Statically find the top-level commands and the listeners defined by the extension `name`, without importing it.
+
+    Commands are returned as dicts with their `name` and `aliases`, and listeners as event names (e.g. `on_message`).
+    """
+    origin = importlib.util.find_spec(name).origin
+    with open(origin, encoding="UTF-8") as f:
+        tree = ast.parse(f.read(), origin)
+
+    entry_points = {"commands": [], "listeners": []}
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+
+        for decorator in function.decorator_list:
+            if not isinstance(decorator, ast.Call):
+                continue
+
+            func = decorator.func
+            decorator_name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            kwargs = {keyword.arg: keyword.value for keyword in decorator.keywords}
+
+            if decorator_name == "listener":
+                event, *_ = _constant_strings(decorator.args[0] if decorator.args else kwargs.get("name")) or [None]
+                entry_points["listeners"].append(event or function.name)
+
+            # Subcommands are registered through their group (e.g. `@some_group.command()`), so they're skipped.
+            elif decorator_name in COMMAND_DECORATORS and (
+                isinstance(func, ast.Name) or (isinstance(func.value, ast.Name) and func.value.id == "commands")
+            ):
+                command, *_ = _constant_strings(decorator.args[0] if decorator.args else kwargs.get("name")) or [None]
+                entry_points["commands"].append({
+                    "name": command or function.name,
+                    "aliases": _constant_strings(kwargs.get("aliases")),
+                })
+
+    return entry_points
+
+
+def load_manifest() -> dict:
+    """
+    Return the extension manifest, using the cached one if the extension files didn't change.
+
+    Otherwise, the extensions are discovered with `walk_extensions` and the manifest is rebuilt.
+    The manifest has the names of all `extensions` and the `entry_points` of each one, see `scan_entry_points`.
+    """
+    fingerprint = fingerprint_extensions()
+    if manifest := read_manifest(fingerprint):
+        return manifest
+
+    logger.info("Extension files changed since the manifest was built, discovering extensions.")
+    extensions = sorted(walk_extensions())
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "fingerprint": fingerprint,
+        "extensions": extensions,
+        "entry_points": {extension: scan_entry_points(extension) for extension in extensions},
+    }
+    write_manifest(manifest)
+    return manifest
+
+
+_MANIFEST = load_manifest()
+EXTENSIONS = frozenset(_MANIFEST["extensions"])
+# Maps extension names to the commands and listeners they define, used to load them lazily.
+ENTRY_POINTS: dict[str, dict[str, list]] = _MANIFEST["entry_points"]
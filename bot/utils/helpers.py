@@ -1,73 +1,217 @@
 import asyncio
-from typing import Any, Callable, Iterable, Optional, TypeVar
+import itertools
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, TYPE_CHECKING, TypeVar
 
 import discord
 import more_itertools
 
 from bot import constants, logger
 
+if TYPE_CHECKING:
+    from bot.bot import ThreadBot
+
 T = TypeVar('T')
+ResolverTier = Callable[[int, discord.TextChannel], Awaitable[Optional[discord.Thread]]]
+
+# Size of the first chunk of a budgeted iteration, and the largest a chunk can grow to.
+INITIAL_BUDGETED_CHUNK_SIZE = 64
+MAX_BUDGETED_CHUNK_SIZE = 65536
+
+
+def _next_chunk_size(size: int, elapsed: float, budget: float) -> int:
+    """Return the chunk size expected to take `budget` seconds to process, given `size` elements took `elapsed`."""
+    if elapsed <= 0:
+        return min(size * 2, MAX_BUDGETED_CHUNK_SIZE)
+    # Shrink right away when elements are expensive, but grow gradually so one fast chunk doesn't overshoot.
+    return max(1, min(int(size * budget / elapsed), size * 2, MAX_BUDGETED_CHUNK_SIZE))
+
+
+async def budgeted_chunks(iterable: Iterable[T], *, budget: Optional[float] = None) -> AsyncIterator[list[T]]:
+    """
+    Split `iterable` into chunks, yielding control to the event loop between each chunk.
+
+    Instead of having a fixed size, chunks are sized from the measured throughput, so that processing each chunk
+    takes about `budget` seconds, `constants.ITERATION_TIME_BUDGET` by default. The time taken by the consumer to
+    process a chunk is included, so expensive work on each element leads to smaller chunks.
+    """
+    budget = budget or constants.ITERATION_TIME_BUDGET
+    iterator = iter(iterable)
+    size = INITIAL_BUDGETED_CHUNK_SIZE
+
+    while chunk := list(itertools.islice(iterator, size)):
+        start = time.perf_counter()
+        yield chunk
+        size = _next_chunk_size(len(chunk), time.perf_counter() - start, budget)
+        await asyncio.sleep(0)  # Yield to the event loop
+
+
+async def budgeted(iterable: Iterable[T], *, budget: Optional[float] = None) -> AsyncIterator[T]:
+    """
+    Asynchronously iterate over `iterable`, yielding control to the event loop about every `budget` seconds.
+
+    Use this for long scans that would otherwise block the event loop, see `budgeted_chunks`.
+    """
+    async for chunk in budgeted_chunks(iterable, budget=budget):
+        for element in chunk:
+            yield element
 
 
 async def chunked_find(
     predicate: Callable[[T], Any],
     seq: Iterable[T],
     *,
-    chunk_size: Optional[int] = None
+    chunk_size: Optional[int] = None,
+    budget: Optional[float] = None
 ) -> Optional[T]:
     """
     A helper to return the first element found in the sequence that meets the predicate.
 
     If chunk_size is specified, chunked_find() will yield control to the event loop between each chunk.
+    If budget is specified instead, it yields about every `budget` seconds, adapting the chunk size to how
+    expensive the predicate is.
     """
-    for chunk in more_itertools.chunked(seq, chunk_size):
+    if budget:
+        chunks = budgeted_chunks(seq, budget=budget)
+    else:
+        chunks = _sleeping_chunks(seq, chunk_size)
+
+    async for chunk in chunks:
         for element in chunk:
             if predicate(element):
                 return element
+    return None
+
 
+async def _sleeping_chunks(seq: Iterable[T], chunk_size: Optional[int]) -> AsyncIterator[list[T]]:
+    """Split `seq` into chunks of `chunk_size`, yielding control to the event loop after each chunk."""
+    for chunk in more_itertools.chunked(seq, chunk_size):
+        yield chunk
         if chunk_size:
             await asyncio.sleep(0)  # Yield to the event loop
-    return None
 
 
 async def _check_first_message_referencing(thread: discord.Thread, message_id: int) -> bool:
     """Check if the thread_starter_message of `thread` references the given `message_id`."""
     messages = await thread.history(limit=1, oldest_first=True).flatten()
-    return messages[0].reference.message_id == message_id
-
-
-async def get_thread_from_message_id(
-    message_id: int,
-    channel: discord.TextChannel,
-    cached_messages: list[discord.Message]
-) -> Optional[discord.Thread]:
-    """Attempt to find the thread linked to the given message id."""
-    def predicate(message: discord.Message) -> bool:
-        """Checks if `message` is the thread_starter_message for the `message_id`."""
-        return (
-            message.reference
-            and message.reference.message_id == message_id
-            and isinstance(message.channel, discord.Thread)
-        )
+    return bool(messages) and messages[0].reference is not None and messages[0].reference.message_id == message_id
 
-    # Try and find the thread start message in message cache.
-    # Use a chunked find as this many checks could block for too long.
-    if message := await chunked_find(predicate, cached_messages, chunk_size=constants.CHUNKED_FIND_CHUNK_SIZE):
-        logger.info("Thread found in message cache!")
-        return message.channel
 
-    for thread in channel.threads:  # Thread may be in cache
-        if await _check_first_message_referencing(thread, message_id):
-            logger.info("Thread found in thread cache!")
-            return thread
+class ThreadResolver:
+    """
+    Finds the thread that was started from a message, trying the cheapest ways first.
 
-    logger.info("Message not found in either cache, fetching all threads...")
-    for thread in await channel.guild.active_threads():
-        if thread.parent != channel:
-            continue
+    The tiers are tried in this order, and the first one to find the thread wins:
 
-        if await _check_first_message_referencing(thread, message_id):
-            logger.info("Thread found in fetched threads!")
-            return thread
+    1. identity_cache: threads started from a message share its id, so look the id up in the thread cache
+    2. identity_fetch: fetch the channel with the message's id, a single API call
+    3. message_cache: look for the thread_starter_message in the message cache
+    4. thread_cache: check the first message of every cached thread in the channel
+    5. active_threads: fetch all active threads in the guild and check the first message of those in the channel
 
-    return None
+    Each tier sends a hit or miss counter and a timer to statsd under `thread.resolver.<tier>`.
+    """
+
+    def __init__(self, bot: "ThreadBot"):
+        self.bot = bot
+        self.tiers: tuple[tuple[str, ResolverTier], ...] = (
+            ("identity_cache", self._from_identity_cache),
+            ("identity_fetch", self._from_identity_fetch),
+            ("message_cache", self._from_message_cache),
+            ("thread_cache", self._from_thread_cache),
+            ("active_threads", self._from_active_threads),
+        )
+
+    async def resolve(self, message_id: int, channel: discord.TextChannel) -> Optional[discord.Thread]:
+        """Attempt to find the thread linked to the given message id."""
+        for name, tier in self.tiers:
+            start = time.perf_counter()
+            thread = await tier(message_id, channel)
+            self.bot.stats.timing(f"thread.resolver.{name}", (time.perf_counter() - start) * 1000)
+
+            if thread:
+                logger.info(f"Thread for message {message_id} found by the {name} tier.")
+                self.bot.stats.incr(f"thread.resolver.{name}.hit")
+                return thread
+            self.bot.stats.incr(f"thread.resolver.{name}.miss")
+
+        return None
+
+    @staticmethod
+    async def _from_identity_cache(message_id: int, channel: discord.TextChannel) -> Optional[discord.Thread]:
+        """Return the cached thread with the same id as the message."""
+        return channel.get_thread(message_id)
+
+    async def _from_identity_fetch(self, message_id: int, channel: discord.TextChannel) -> Optional[discord.Thread]:
+        """Fetch the channel with the same id as the message, and return it if it's a thread in `channel`."""
+        try:
+            thread = await self.bot.fetch_channel(message_id)
+        except (discord.NotFound, discord.Forbidden):
+            return None
+
+        if isinstance(thread, discord.Thread) and thread.parent_id == channel.id:
+            return thread
+        return None
+
+    async def _from_message_cache(self, message_id: int, channel: discord.TextChannel) -> Optional[discord.Thread]:
+        """Return the thread of the cached thread_starter_message that references the message."""
+        if self.bot.message_cache is None:
+            return None
+
+        message = self.bot.message_cache.get_thread_starter(message_id)
+        if message and isinstance(message.channel, discord.Thread):
+            return message.channel
+        return None
+
+    async def _from_thread_cache(self, message_id: int, channel: discord.TextChannel) -> Optional[discord.Thread]:
+        """Return the cached thread in `channel` whose first message references the message."""
+        return await self._probe_threads(channel.threads, message_id, stat="thread.probe.cached")
+
+    async def _from_active_threads(self, message_id: int, channel: discord.TextChannel) -> Optional[discord.Thread]:
+        """Return the active thread in `channel` whose first message references the message."""
+        active_threads = (thread for thread in await channel.guild.active_threads() if thread.parent == channel)
+        return await self._probe_threads(active_threads, message_id, stat="thread.probe.active")
+
+    async def _probe_threads(
+        self,
+        threads: Iterable[discord.Thread],
+        message_id: int,
+        *,
+        stat: str,
+        concurrency: Optional[int] = None
+    ) -> Optional[discord.Thread]:
+        """
+        Return the first of `threads` whose thread_starter_message references `message_id`.
+
+        Up to `concurrency` threads are checked at a time, and the remaining checks are cancelled as soon as one
+        matches. The number of threads checked and the time taken are sent to statsd under `stat`.
+        """
+        threads = iter(threads)
+        probes = 0
+
+        async def worker() -> Optional[discord.Thread]:
+            """Check threads one by one until one matches or there are none left to check."""
+            nonlocal probes
+            for thread in threads:
+                probes += 1
+                try:
+                    if await _check_first_message_referencing(thread, message_id):
+                        return thread
+                except discord.HTTPException as e:
+                    logger.warning(f"Failed to fetch the first message of thread {thread.id}: {e}")
+            return None
+
+        start = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency or constants.THREAD_PROBE_CONCURRENCY)]
+        found = None
+        try:
+            for next_done in asyncio.as_completed(workers):
+                if found := await next_done:
+                    break
+        finally:
+            for task in workers:
+                task.cancel()
+
+        self.bot.stats.timing(f"{stat}.time", (time.perf_counter() - start) * 1000)
+        self.bot.stats.timing(f"{stat}.probes", probes)
+        return found
@@ -0,0 +1,234 @@
+import asyncio
+import functools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Mapping, Optional, TYPE_CHECKING
+
+from bot import logger
+
+if TYPE_CHECKING:
+    from bot.async_stats import AsyncStatsClient
+
+# An operation's route name and the id of the resource it acts on, which Discord rate limits together.
+Bucket = tuple[str, int]
+
+
+@dataclass
+class RateLimit:
+    """Allows `limit` operations in any window of `per` seconds."""
+
+    limit: int
+    per: float
+
+
+@dataclass
+class Operation:
+    """An API call waiting for its turn in a bucket."""
+
+    key: Hashable
+    run: Callable[[], Awaitable[Any]]
+    skip: Optional[Callable[[], bool]]
+    queued_at: float
+    # The futures of the callers waiting for the result, as the operation may be submitted more than once.
+    waiters: list[asyncio.Future] = field(default_factory=list)
+    # Whether a caller submitted it without waiting for it, so failures have to be logged.
+    background: bool = False
+
+
+@dataclass
+class BucketState:
+    """The operations waiting in a bucket, and when the most recent ones started."""
+
+    queue: deque[Operation] = field(default_factory=deque)
+    started: deque[float] = field(default_factory=deque)
+    worker: Optional[asyncio.Task] = None
+
+
+class BucketScheduler:
+    """
+    Runs API calls one at a time per rate limit bucket, paced so no bucket exceeds its rate limit.
+
+    Calls are submitted with the route and resource id they use, which make up their bucket, and a key.
+    While a call with the same key is queued, submitting another one waits for the queued call instead
+    of queueing it again. A call can also be given a `skip` check, which is run right before
+    its turn; if it returns True, the call is no longer needed and isn't made.
+
+    Calls are plain callables returning awaitables, so the scheduler doesn't depend on discord.py and
+    can be driven by a stand-in for the HTTP client, with a `clock` and `sleep` that don't take real time.
+    The time calls spend queued is sent to statsd as `<name>.<route>.wait`, and the amount of queued
+    calls as the `<name>.queued` gauge.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        stats: "AsyncStatsClient",
+        name: str,
+        *,
+        limits: Mapping[str, RateLimit],
+        default_limit: RateLimit,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+    ):
+        self.loop = loop
+        self.stats = stats
+        self.name = name
+        self.limits = limits
+        self.default_limit = default_limit
+        self.clock = clock
+        self.sleep = sleep
+
+        self._buckets: dict[Bucket, BucketState] = {}
+        self._queued: dict[Hashable, Operation] = {}
+
+    @property
+    def queued(self) -> int:
+        """The amount of operations waiting to run."""
+        return len(self._queued)
+
+    def submit(
+        self,
+        route: str,
+        resource_id: int,
+        key: Hashable,
+        run: Callable[[], Awaitable[Any]],
+        *,
+        skip: Optional[Callable[[], bool]] = None
+    ) -> asyncio.Future:
+        """
+        Queue `run` in the bucket of `route` and `resource_id`, and return a future for its result.
+
+        Failures are set on the future rather than logged, so it must be awaited. Cancelling it stops waiting
+        for the operation, which is dropped if nobody else is waiting for it by its turn. If `skip` returns
+        True when the operation's turn comes, the future completes with None without running it.
+        """
+        operation = self._enqueue(route, resource_id, key, run, skip)
+        future = self.loop.create_future()
+        future.add_done_callback(functools.partial(self._withdraw, operation))
+        operation.waiters.append(future)
+        return future
+
+    def submit_background(
+        self,
+        route: str,
+        resource_id: int,
+        key: Hashable,
+        run: Callable[[], Awaitable[Any]],
+        *,
+        skip: Optional[Callable[[], bool]] = None
+    ) -> None:
+        """Queue `run` like `submit`, for callers that don't wait for it. Failures are logged instead."""
+        self._enqueue(route, resource_id, key, run, skip).background = True
+
+    def _enqueue(
+        self,
+        route: str,
+        resource_id: int,
+        key: Hashable,
+        run: Callable[[], Awaitable[Any]],
+        skip: Optional[Callable[[], bool]]
+    ) -> Operation:
+        """Return the operation queued with `key`, queueing `run` in its bucket if there isn't one."""
+        if operation := self._queued.get(key):
+            self.stats.incr(f"{self.name}.coalesced")
+            return operation
+
+        operation = Operation(key, run, skip, self.clock())
+        self._queued[key] = operation
+
+        bucket = self._buckets.setdefault((route, resource_id), BucketState())
+        bucket.queue.append(operation)
+        if bucket.worker is None:
+            bucket.worker = self.loop.create_task(self._drain((route, resource_id), bucket))
+
+        self.stats.gauge(f"{self.name}.queued", self.queued)
+        return operation
+
+    @staticmethod
+    def _withdraw(operation: Operation, future: asyncio.Future) -> None:
+        """Stop counting the caller of `future` as waiting for `operation`, if it was cancelled."""
+        if future.cancelled():
+            if future in operation.waiters:
+                operation.waiters.remove(future)
+        else:
+            future.exception()  # Mark it as retrieved, as the caller may have been cancelled after it was set.
+
+    @staticmethod
+    def _settle(operation: Operation, result: object = None, exception: Optional[Exception] = None) -> None:
+        """Complete the futures of the callers waiting for `operation` with its result or exception."""
+        for waiter in tuple(operation.waiters):
+            if waiter.done():
+                continue
+            if exception:
+                waiter.set_exception(exception)
+            else:
+                waiter.set_result(result)
+
+    def _delay(self, route: str, bucket: BucketState) -> float:
+        """Return how long to wait before the next operation in `bucket` can start."""
+        limit = self.limits.get(route, self.default_limit)
+        now = self.clock()
+        while bucket.started and now - bucket.started[0] >= limit.per:
+            bucket.started.popleft()
+
+        if len(bucket.started) < limit.limit:
+            return 0
+        return bucket.started[0] + limit.per - now
+
+    async def _drain(self, bucket_key: Bucket, bucket: BucketState) -> None:
+        """Run the operations queued in `bucket`, in order, waiting for the rate limit between them."""
+        route, _ = bucket_key
+        try:
+            while bucket.queue:
+                if (delay := self._delay(route, bucket)) > 0:
+                    await self.sleep(delay)
+
+                operation = bucket.queue.popleft()
+                del self._queued[operation.key]
+                self.stats.gauge(f"{self.name}.queued", self.queued)
+
+                if not operation.background and all(waiter.done() for waiter in operation.waiters):
+                    continue  # Everyone waiting for it was cancelled.
+                if operation.skip and operation.skip():
+                    self.stats.incr(f"{self.name}.{route}.skipped")
+                    self._settle(operation)
+                    continue
+
+                self.stats.timing(f"{self.name}.{route}.wait", (self.clock() - operation.queued_at) * 1000)
+                bucket.started.append(self.clock())
+                try:
+                    result = await operation.run()
+                except asyncio.CancelledError:
+                    for waiter in tuple(operation.waiters):
+                        waiter.cancel()
+                    raise
+                except Exception as e:
+                    # Whoever waits for it gets the exception, so it's only logged if nobody might see it otherwise.
+                    if operation.background:
+                        logger.exception(f"Scheduled {route} operation {operation.key!r} failed.")
+                    self._settle(operation, exception=e)
+                else:
+                    self._settle(operation, result)
+        finally:
+            bucket.worker = None
+            # Forget the bucket once the operations it ran no longer count towards its limit.
+            limit = self.limits.get(route, self.default_limit)
+            self.loop.call_later(limit.per, self._discard_idle, bucket_key, bucket)
+
+    def _discard_idle(self, bucket_key: Bucket, bucket: BucketState) -> None:
+        """Forget `bucket` if nothing was queued in it since its worker finished."""
+        if bucket.worker is None and not bucket.queue and self._buckets.get(bucket_key) is bucket:
+            del self._buckets[bucket_key]
+
+    def close(self) -> None:
+        """Stop running operations, and cancel the ones that haven't run yet."""
+        for bucket in self._buckets.values():
+            if bucket.worker:
+                bucket.worker.cancel()
+        for operation in self._queued.values():
+            for waiter in tuple(operation.waiters):
+                waiter.cancel()
+
+        self._buckets.clear()
+        self._queued.clear()
@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+from typing import Awaitable, Callable
+from unittest import mock
+
+from bot.utils import ratelimit
+from bot.utils.ratelimit import BucketScheduler, RateLimit
+
+
+class FakeClock:
+    """A clock which only moves forward when the scheduler sleeps, so pacing doesn't take real time."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        """Yield to the event loop once, so other tasks run at the current time, then advance the clock by `delay`."""
+        deadline = self.now + delay
+        await asyncio.sleep(0)
+        self.now = max(self.now, deadline)
+
+
+class BucketSchedulerTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for the pacing, coalescing, and skipping of operations by `BucketScheduler`."""
+
+    async def asyncSetUp(self) -> None:
+        """Create a scheduler with a fake clock, which paces operations without waiting."""
+        self.clock = FakeClock()
+        self.stats = mock.Mock()
+        self.scheduler = BucketScheduler(
+            asyncio.get_running_loop(),
+            self.stats,
+            "ops",
+            limits={"edit": RateLimit(2, 10.0)},
+            default_limit=RateLimit(5, 5.0),
+            clock=self.clock,
+            sleep=self.clock.sleep
+        )
+        self.addCleanup(self.scheduler.close)
+
+    def operation(self, calls: list, name: str) -> Callable[[], Awaitable[str]]:
+        """Return an operation which records the time it ran at in `calls`, and returns `name`."""
+        async def run() -> str:
+            calls.append((name, self.clock()))
+            return name
+        return run
+
+    async def test_operations_are_paced_per_bucket(self) -> None:
+        """Operations in a bucket wait for its rate limit, without delaying other buckets."""
+        calls = []
+        futures = [
+            self.scheduler.submit("edit", 1, f"first-{i}", self.operation(calls, f"first-{i}"))
+            for i in range(4)
+        ]
+        futures.append(self.scheduler.submit("edit", 2, "second", self.operation(calls, "second")))
+
+        results = await asyncio.gather(*futures)
+
+        self.assertEqual(results, ["first-0", "first-1", "first-2", "first-3", "second"])
+        self.assertEqual(
+            sorted(calls, key=lambda call: call[0]),
+            [("first-0", 0.0), ("first-1", 0.0), ("first-2", 10.0), ("first-3", 10.0), ("second", 0.0)]
+        )
+
+    async def test_queued_operations_are_coalesced_by_key(self) -> None:
+        """Submitting an operation whose key is already queued waits for the queued operation instead."""
+        calls = []
+        first = self.scheduler.submit("edit", 1, "key", self.operation(calls, "first"))
+        second = self.scheduler.submit("edit", 1, "key", self.operation(calls, "second"))
+
+        self.assertEqual(await asyncio.gather(first, second), ["first", "first"])
+        self.assertEqual(calls, [("first", 0.0)])
+        self.stats.incr.assert_called_once_with("ops.coalesced")
+
+        # Once it ran, the key can be queued again.
+        self.assertEqual(await self.scheduler.submit("edit", 1, "key", self.operation(calls, "third")), "third")
+
+    async def test_cancelling_one_waiter_keeps_coalesced_operation(self) -> None:
+        """An operation still runs for the other callers when one of the callers waiting for it is cancelled."""
+        calls = []
+        cancelled = self.scheduler.submit("edit", 1, "key", self.operation(calls, "first"))
+        kept = self.scheduler.submit("edit", 1, "key", self.operation(calls, "second"))
+        cancelled.cancel()
+
+        self.assertEqual(await kept, "first")
+        self.assertEqual(calls, [("first", 0.0)])
+
+    async def test_operations_nobody_waits_for_are_dropped(self) -> None:
+        """An operation isn't run if every caller waiting for it was cancelled before its turn."""
+        calls = []
+        for _ in range(2):
+            self.scheduler.submit("edit", 1, "dropped", self.operation(calls, "dropped")).cancel()
+        kept = self.scheduler.submit("edit", 1, "kept", self.operation(calls, "kept"))
+
+        self.assertEqual(await kept, "kept")
+        self.assertEqual(calls, [("kept", 0.0)])
+
+    async def test_skipped_operations_do_not_run(self) -> None:
+        """An operation whose skip check returns True when its turn comes completes with None without running."""
+        calls = []
+        skipped = self.scheduler.submit("edit", 1, "skipped", self.operation(calls, "skipped"), skip=lambda: True)
+        kept = self.scheduler.submit("edit", 1, "kept", self.operation(calls, "kept"), skip=lambda: False)
+
+        self.assertIsNone(await skipped)
+        self.assertEqual(await kept, "kept")
+        self.assertEqual(calls, [("kept", 0.0)])
+        self.stats.incr.assert_called_once_with("ops.edit.skipped")
+
+    async def test_failed_operations_do_not_stop_the_bucket(self) -> None:
+        """A failing operation sets the exception on its future without logging it, and the next one still runs."""
+        async def fail() -> None:
+            raise RuntimeError("Discord is down")
+
+        calls = []
+        failed = self.scheduler.submit("edit", 1, "failed", fail)
+        kept = self.scheduler.submit("edit", 1, "kept", self.operation(calls, "kept"))
+
+        with mock.patch.object(ratelimit.logger, "exception") as log_exception:
+            with self.assertRaises(RuntimeError):
+                await failed
+            self.assertEqual(await kept, "kept")
+        log_exception.assert_not_called()
+
+    async def test_failed_background_operations_are_logged(self) -> None:
+        """A failing operation submitted in the background is logged, as nobody else would see the failure."""
+        async def fail() -> None:
+            raise RuntimeError("Discord is down")
+
+        self.scheduler.submit_background("send", 1, "failed", fail)
+        with mock.patch.object(ratelimit.logger, "exception") as log_exception:
+            await self.scheduler.submit("send", 1, "after", self.operation([], "after"))
+        log_exception.assert_called_once()
+
+    async def test_close_cancels_running_and_queued_operations(self) -> None:
+        """Closing the scheduler cancels the operation running in each bucket and the ones waiting behind it."""
+        started = asyncio.Event()
+
+        async def block() -> None:
+            started.set()
+            await asyncio.Event().wait()
+
+        running = self.scheduler.submit("edit", 1, "running", block)
+        queued = self.scheduler.submit("edit", 1, "queued", self.operation([], "queued"))
+        await started.wait()
+
+        self.scheduler.close()
+        await asyncio.sleep(0)  # Let the cancelled worker finish.
+
+        self.assertTrue(running.cancelled())
+        self.assertTrue(queued.cancelled())
+        self.assertEqual(self.scheduler.queued, 0)